@@ -1,10 +1,22 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.utils import timezone
 from django.utils.html import format_html
 from unfold.admin import ModelAdmin
 from django.apps import AppConfig
 
-from .models import CustomUser, Room, Booking, GalleryImage
+from .exports import iter_bookings_csv
+from .forms import GalleryImportForm
+from .imports import import_gallery
+from .models import CustomUser, Room, Booking, GalleryImage, RateRule
+from .slow_queries import top_offenders
 
 # Unregister the default Group admin
 from django.contrib.auth.models import Group
@@ -15,6 +27,54 @@ admin.site.unregister(Group)
 admin.site.site_header = "Hotel Management System"
 admin.site.site_title = "Hotel Management"
 admin.site.index_title = "Hotel Administration"
+# Adds the occupancy dashboard filled in by bookings.stats.dashboard_callback
+admin.site.index_template = "admin/hotel_dashboard.html"
+
+
+def slow_queries(request):
+    """Statements from the slow query log, by total time spent.
+
+    Routed in hotel_management/urls.py, wrapped in admin.site.admin_view.
+    """
+    # Logged parameters can hold guests' personal data
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    return TemplateResponse(
+        request,
+        "admin/slow_queries.html",
+        {
+            **admin.site.each_context(request),
+            "title": "Slow queries",
+            "threshold": settings.SLOW_QUERY_MS,
+            "offenders": top_offenders(),
+        },
+    )
+
+
+class PrefixAutocompleteMixin:
+    """Serve autocomplete searches from indexed lower-case prefix ranges.
+
+    The admin's default icontains search can't use an index. Each field in
+    ``autocomplete_prefix_fields`` has a Lower() index, which a range
+    comparison on the lowered value can use.
+    """
+
+    autocomplete_prefix_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        match = request.resolver_match
+        if not (match and match.url_name == "autocomplete" and search_term):
+            return super().get_search_results(request, queryset, search_term)
+
+        prefix = search_term.strip().lower()
+        condition = Q()
+        for field in self.autocomplete_prefix_fields:
+            alias = f"{field}_lower"
+            queryset = queryset.alias(**{alias: Lower(field)})
+            condition |= Q(
+                **{f"{alias}__gte": prefix, f"{alias}__lt": prefix + "\uffff"}
+            )
+        return queryset.filter(condition), False
 
 
 class RoomImagesInline(admin.TabularInline):
@@ -38,30 +98,42 @@ class CustomGroupAdmin(admin.ModelAdmin):
 
 @admin.register(GalleryImage)
 class GalleryImageAdmin(ModelAdmin):
-    list_display = ["thumbnail_preview", "title", "room", "is_primary", "upload_date"]
-    list_filter = ["is_primary", "upload_date", "room"]
+    list_display = [
+        "thumbnail_preview",
+        "title",
+        "room",
+        "is_primary",
+        "processing_status",
+        "upload_date",
+    ]
+    list_filter = ["is_primary", "processing_status", "upload_date", "room"]
     search_fields = ["title", "room__name"]
+    readonly_fields = ["processing_status", "processed_at"]
 
     def thumbnail_preview(self, obj):
-        if obj.thumbnail:
+        if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px;"/>',
-                obj.thumbnail.url,
+                obj.renditions["thumbnail"],
             )
         return ""
 
     thumbnail_preview.short_description = "Preview"
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("room")
+
     class Meta:
         verbose_name = "Gallery Image"
         verbose_name_plural = "Gallery"
 
 
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin, ModelAdmin):
+class CustomUserAdmin(PrefixAutocompleteMixin, UserAdmin, ModelAdmin):
     list_display = ("username", "email", "role", "phone", "is_staff")
     list_filter = ("role", "is_staff", "is_active")
     search_fields = ("username", "email", "first_name", "last_name")
+    autocomplete_prefix_fields = ("username", "email")
     ordering = ("username",)
 
     fieldsets = (
@@ -102,7 +174,7 @@ class CustomUserAdmin(UserAdmin, ModelAdmin):
 
 
 @admin.register(Room)
-class RoomAdmin(ModelAdmin):
+class RoomAdmin(PrefixAutocompleteMixin, ModelAdmin):
     list_display = [
         "room_number",
         "name",
@@ -113,7 +185,9 @@ class RoomAdmin(ModelAdmin):
     ]
     list_filter = ["room_type", "is_active", "floor"]
     search_fields = ["name", "room_number"]
+    autocomplete_prefix_fields = ("room_number",)
     inlines = [RoomImagesInline]
+    actions = ["import_gallery"]
 
     fieldsets = (
         (
@@ -156,15 +230,60 @@ class RoomAdmin(ModelAdmin):
 
     def primary_image_preview(self, obj):
         primary_image = obj.get_primary_image()
-        if primary_image and primary_image.thumbnail:
+        if primary_image:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px;"/>',
-                primary_image.thumbnail.url,
+                primary_image.renditions["thumbnail"],
             )
         return ""
 
     primary_image_preview.short_description = "Primary Image"
 
+    def import_gallery(self, request, queryset):
+        form = GalleryImportForm(
+            request.POST if "apply" in request.POST else None, request.FILES or None
+        )
+        if form.is_valid():
+            rooms = list(queryset)
+            try:
+                result = import_gallery(
+                    form.cleaned_data["archive"],
+                    rooms=queryset,
+                    default_room=rooms[0] if len(rooms) == 1 else None,
+                )
+            except ValueError as exc:
+                self.message_user(request, exc, messages.ERROR)
+                return None
+            self.message_user(
+                request,
+                f"Imported {result.created} images; they appear once "
+                "process_images has resized them.",
+                messages.SUCCESS,
+            )
+            for name, reason in result.skipped:
+                self.message_user(
+                    request, f"Skipped {name}: {reason}", messages.WARNING
+                )
+            return None
+        return TemplateResponse(
+            request,
+            "admin/bookings/room/import_gallery.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": "Import photos",
+                "opts": self.model._meta,
+                "form": form,
+                "queryset": queryset,
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            },
+        )
+
+    import_gallery.short_description = "Import photos from a ZIP"
+
+    def get_queryset(self, request):
+        # get_primary_image reads the prefetched images
+        return super().get_queryset(request).prefetch_related("images")
+
     class Meta:
         verbose_name = "Room"
         verbose_name_plural = "Rooms"
@@ -185,6 +304,8 @@ class BookingAdmin(ModelAdmin):
     search_fields = ("room__name", "guest__email", "guest__username")
     ordering = ("-booking_date",)
     readonly_fields = ("booking_date", "total_price")
+    autocomplete_fields = ("room", "guest")
+    actions = ["export_csv"]
 
     fieldsets = (
         ("Booking Information", {"fields": ("room", "guest", "status")}),
@@ -197,18 +318,49 @@ class BookingAdmin(ModelAdmin):
     )
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).select_related("room", "guest")
         if request.user.is_superuser or request.user.role == CustomUser.ADMIN:
             return qs
         elif request.user.role == CustomUser.TEAM:
             return qs.filter(status__in=["pending", "confirmed"])
         return qs.filter(guest=request.user)
 
+    def export_csv(self, request, queryset):
+        # With "select all", queryset is the whole filtered changelist
+        filename = f"reservations-{timezone.now():%Y%m%d-%H%M}.csv"
+        response = StreamingHttpResponse(
+            iter_bookings_csv(queryset), content_type="text/csv"
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    export_csv.short_description = "Export selected reservations to CSV"
+
     class Meta:
         verbose_name = "Reservation"
         verbose_name_plural = "Reservations"
 
 
+@admin.register(RateRule)
+class RateRuleAdmin(ModelAdmin):
+    list_display = (
+        "name",
+        "room_type",
+        "start_date",
+        "end_date",
+        "weekdays",
+        "multiplier",
+        "is_active",
+    )
+    list_filter = ("is_active", "room_type")
+    search_fields = ("name",)
+    date_hierarchy = "start_date"
+
+    class Meta:
+        verbose_name = "Rate Rule"
+        verbose_name_plural = "Rate Calendar"
+
+
 # Update the app config
 
 
@@ -0,0 +1,156 @@
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class QueryTimer:
+    """Execute wrapper counting queries and their time on a connection"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+@dataclass
+class Scenario:
+    """One request to time; ``data`` may be a callable of the iteration"""
+
+    name: str
+    path: str
+    data: object = None
+    method: str = "get"
+    user: object = None
+    status: int = 200
+
+    def request_data(self, iteration):
+        return self.data(iteration) if callable(self.data) else self.data
+
+
+def default_scenarios(room, guest, staff):
+    today = timezone.localdate()
+    search = {
+        "check_in": today + timedelta(days=30),
+        "check_out": today + timedelta(days=33),
+        "adults": 2,
+        "children": 0,
+    }
+    # Seeded bookings end within about six months, so these dates are free
+    first_free = today + timedelta(days=365)
+
+    def booking(iteration):
+        check_in = first_free + timedelta(days=2 * iteration)
+        return {
+            "check_in": check_in,
+            "check_out": check_in + timedelta(days=1),
+            "num_adults": 1,
+            "num_children": 0,
+        }
+
+    return [
+        Scenario("home", reverse("home")),
+        Scenario("home_search", reverse("home"), search),
+        Scenario("home_flexible", reverse("home"), {**search, "flexibility": "3"}),
+        Scenario("room_detail", reverse("room_detail", args=[room.id])),
+        Scenario("get_booked_dates", reverse("get_booked_dates", args=[room.id])),
+        Scenario("book_room_form", reverse("book_room", args=[room.id]), user=guest),
+        Scenario(
+            "book_room",
+            reverse("book_room", args=[room.id]),
+            booking,
+            method="post",
+            user=guest,
+            status=302,
+        ),
+        Scenario(
+            "admin_bookings",
+            reverse("admin:bookings_booking_changelist"),
+            user=staff,
+        ),
+        Scenario("admin_rooms", reverse("admin:bookings_room_changelist"), user=staff),
+        Scenario(
+            "admin_users", reverse("admin:bookings_customuser_changelist"), user=staff
+        ),
+    ]
+
+
+def run_scenario(scenario, iterations, warmup=5, clear_cache=True):
+    """Latency percentiles, query count and query time of a scenario.
+
+    With ``clear_cache`` every request starts from an empty cache, so the
+    numbers cover the database work behind it rather than cache hits.
+    """
+    client = Client()
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    send = getattr(client, scenario.method)
+
+    latencies, queries, query_times = [], [], []
+    for iteration in range(warmup + iterations):
+        if clear_cache:
+            cache.clear()
+        data = scenario.request_data(iteration)
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = send(scenario.path, data)
+            elapsed = time.perf_counter() - started
+        if response.status_code != scenario.status:
+            raise ValueError(
+                f"{scenario.name}: expected HTTP {scenario.status}, "
+                f"got {response.status_code}"
+            )
+        if iteration >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(timer.count)
+            query_times.append(timer.seconds * 1000)
+
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "queries": max(queries),
+        "query_ms": round(statistics.median(query_times), 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Messages for each scenario slower or more query-heavy than its baseline.
+
+    Latency regresses when the median grows by more than ``threshold`` (a
+    fraction); query counts are deterministic, so any increase regresses.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append(
+                f"{name}: {before['queries']} -> {result['queries']} queries"
+            )
+        if result["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p50 {before['p50_ms']:.1f} -> {result['p50_ms']:.1f} ms"
+            )
+    return regressions
@@ -0,0 +1,93 @@
+import hashlib
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+SEARCH_PREFIX = "room_search"
+ROOMS_VERSION_KEY = f"{SEARCH_PREFIX}:v:rooms"
+
+
+def _date_version_key(day):
+    return f"{SEARCH_PREFIX}:v:{day.isoformat()}"
+
+
+def _dates(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _set_versions(versions):
+    # A version only has to outlive the searches stored under it; one that
+    # expires just makes those entries unreachable
+    cache.set_many(versions, timeout=settings.ROOM_SEARCH_CACHE_TIMEOUT)
+
+
+async def _aget_versions(keys):
+    versions = await cache.aget_many(keys)
+    # A version that was never set or got evicted gets a fresh token, so an
+    # entry stored under an older token can never be matched again.
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, timeout=settings.ROOM_SEARCH_CACHE_TIMEOUT)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+async def aroom_search_version(check_in, check_out):
+    """Digest that changes whenever rooms or bookings on these dates change"""
+    keys = [ROOMS_VERSION_KEY] + [
+        _date_version_key(day) for day in _dates(check_in, check_out)
+    ]
+    versions = await _aget_versions(keys)
+    return hashlib.md5(":".join(versions).encode()).hexdigest()
+
+
+async def aroom_search_key(check_in, check_out, adults, children):
+    """Cache key for a search, tied to the version of every date it covers"""
+    digest = await aroom_search_version(check_in, check_out)
+    return f"{SEARCH_PREFIX}:{check_in}:{check_out}:{adults}:{children}:{digest}"
+
+
+async def aflexible_search_key(first, last, nights, adults, children):
+    """Cache key for a flexible search, tied to every date its stays touch"""
+    window_end = last + timedelta(days=nights)
+    key = await aroom_search_key(first, window_end, adults, children)
+    return f"{key}:flex:{nights}"
+
+
+async def aget_room_search(key):
+    return await cache.aget(key)
+
+
+async def aset_room_search(key, room_ids):
+    await cache.aset(key, room_ids, timeout=settings.ROOM_SEARCH_CACHE_TIMEOUT)
+
+
+def invalidate_room_search(check_in=None, check_out=None):
+    """Expire cached searches overlapping the dates, or all of them"""
+    if check_in is None or check_out is None:
+        _set_versions({ROOMS_VERSION_KEY: uuid.uuid4().hex})
+        return
+    token = uuid.uuid4().hex
+    _set_versions(
+        {_date_version_key(day): token for day in _dates(check_in, check_out)}
+    )
+
+
+def room_card_key(room):
+    """Fragment key that changes with the room and its primary image"""
+    image = room.get_primary_image()
+    image_version = (
+        f"{image.pk}-{image.image.name}-{image.processing_status}" if image else "none"
+    )
+    digest = hashlib.md5(image_version.encode()).hexdigest()
+    return f"room_card:{room.pk}:{room.updated_at.timestamp()}:{digest}"
+
+
+def get_room_cards(keys):
+    return cache.get_many(keys)
+
+
+def set_room_cards(cards):
+    cache.set_many(cards, timeout=settings.ROOM_CARD_CACHE_TIMEOUT)
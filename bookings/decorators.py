@@ -0,0 +1,33 @@
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, quote_etag
+
+
+def async_etag(etag_func):
+    """Async counterpart of django.views.decorators.http.etag.
+
+    Django's decorator calls ``etag_func`` synchronously, which rules out the
+    async ORM. Here ``etag_func`` is a coroutine awaited before the view runs.
+    It returns None to skip the conditional check, e.g. for a missing object,
+    and only 200 responses carry the ETag.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            res_etag = await etag_func(request, *args, **kwargs)
+            res_etag = quote_etag(res_etag) if res_etag is not None else None
+            response = get_conditional_response(request, etag=res_etag)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if (
+                res_etag
+                and request.method in ("GET", "HEAD")
+                and response.status_code == 200
+            ):
+                response.headers.setdefault("ETag", res_etag)
+            return response
+
+        return inner
+
+    return decorator
@@ -0,0 +1,48 @@
+import csv
+
+# (lookup, header) pairs, read with values_list so rows skip model instances
+BOOKING_EXPORT_FIELDS = [
+    ("id", "Booking ID"),
+    ("status", "Status"),
+    ("check_in", "Check-in"),
+    ("check_out", "Check-out"),
+    ("num_adults", "Adults"),
+    ("num_children", "Children"),
+    ("total_price", "Total Price"),
+    ("booking_date", "Booking Date"),
+    ("room__room_number", "Room Number"),
+    ("room__name", "Room Name"),
+    ("room__room_type", "Room Type"),
+    ("guest__username", "Guest Username"),
+    ("guest__email", "Guest Email"),
+    ("guest__first_name", "Guest First Name"),
+    ("guest__last_name", "Guest Last Name"),
+    ("guest__phone", "Guest Phone"),
+    ("special_requests", "Special Requests"),
+]
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def escape_formula(value):
+    """Quote guest-entered text so spreadsheets show it instead of running it"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def iter_bookings_csv(queryset, chunk_size=2000):
+    """Yield CSV lines for the bookings, reading the rows in chunks"""
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for _, header in BOOKING_EXPORT_FIELDS])
+    rows = queryset.values_list(*[lookup for lookup, _ in BOOKING_EXPORT_FIELDS])
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield writer.writerow([escape_formula(value) for value in row])
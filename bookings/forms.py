@@ -1,8 +1,13 @@
+from datetime import timedelta
+
 from django.utils import timezone
 from django import forms
 from django.utils.translation import gettext_lazy as _
 from bookings.models import Booking
 
+# Longest stay a search or quote covers; bounds the dates each one touches
+MAX_STAY_NIGHTS = 365
+
 
 class RoomFilterForm(forms.Form):
     check_in = forms.DateField(
@@ -48,6 +53,68 @@ class RoomFilterForm(forms.Form):
         ),
         label=_("Children"),
     )
+    flexibility = forms.ChoiceField(
+        choices=[
+            ("", _("Exact dates")),
+            ("1", _("± 1 day")),
+            ("3", _("± 3 days")),
+            ("7", _("± 7 days")),
+            ("month", _("Any dates that month")),
+        ],
+        required=False,
+        widget=forms.Select(
+            attrs={
+                "class": "bg-gray-50 border border-gray-300 text-gray-900 text-sm rounded-lg focus:ring-blue-500 focus:border-blue-500 block w-full p-2.5"
+            }
+        ),
+        label=_("Flexible Dates"),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get("check_in")
+        check_out = cleaned_data.get("check_out")
+        if check_in and check_out:
+            if check_in >= check_out:
+                raise forms.ValidationError(
+                    "Check-out date must be after check-in date"
+                )
+            # Each date searched costs cache keys and priced nights
+            if (check_out - check_in).days > MAX_STAY_NIGHTS:
+                raise forms.ValidationError("Stays are limited to a year")
+            first, last = self.get_search_window()
+            if (last - first).days > MAX_STAY_NIGHTS:
+                raise forms.ValidationError(
+                    "Flexible searches are limited to a year of dates"
+                )
+        return cleaned_data
+
+    @property
+    def is_flexible(self):
+        return bool(self.cleaned_data.get("flexibility"))
+
+    @property
+    def nights(self):
+        return (self.cleaned_data["check_out"] - self.cleaned_data["check_in"]).days
+
+    def get_check_in_range(self):
+        """First and last check-in date the search covers"""
+        check_in = self.cleaned_data["check_in"]
+        flexibility = self.cleaned_data.get("flexibility")
+        if not flexibility:
+            return check_in, check_in
+        if flexibility == "month":
+            first = check_in.replace(day=1)
+            last = (first + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        else:
+            first = check_in - timedelta(days=int(flexibility))
+            last = check_in + timedelta(days=int(flexibility))
+        return max(first, timezone.now().date()), last
+
+    def get_search_window(self):
+        """Every date a stay found by this search could occupy"""
+        first, last = self.get_check_in_range()
+        return first, last + timedelta(days=self.nights)
 
 
 class BookingForm(forms.ModelForm):
@@ -112,3 +179,14 @@ class BookingForm(forms.ModelForm):
                 raise forms.ValidationError("Check-in date cannot be in the past")
 
         return cleaned_data
+
+
+class GalleryImportForm(forms.Form):
+    archive = forms.FileField(
+        label=_("ZIP of images"),
+        help_text=_(
+            "Optional manifest.csv with file, room, order and primary columns; "
+            "otherwise folders named after room numbers, or the selected room."
+        ),
+        widget=forms.ClearableFileInput(attrs={"accept": ".zip"}),
+    )
@@ -0,0 +1,112 @@
+import hashlib
+import posixpath
+
+from django.conf import settings
+from imagekit.models import ImageSpecField
+from imagekit.processors import ResizeToFit
+from PIL import Image
+
+# name: (max width, max height, quality); None leaves that side unbounded
+RENDITIONS = {
+    "thumbnail": (300, 300, 80),
+    "w320": (320, None, 75),
+    "w640": (640, None, 80),
+    "w960": (960, None, 80),
+    "w1280": (1280, None, 80),
+    "w1920": (1920, None, 85),
+}
+
+# Renditions offered to the browser in srcset, smallest first
+SRCSET_WIDTHS = ["w320", "w640", "w960", "w1280", "w1920"]
+
+FORMATS = {"": "JPEG", "_webp": "WEBP"}
+
+PLACEHOLDER = "images/placeholder.svg"
+PLACEHOLDER_SIZE = (640, 480)
+
+
+class Deferred:
+    """Cache file strategy that never generates during a request.
+
+    The process_images worker builds every rendition ahead of time, so
+    accessing a URL must not open the source or check storage.
+    """
+
+    def should_verify_existence(self, file):
+        return False
+
+
+def rendition_field(name, suffix=""):
+    width, height, quality = RENDITIONS[name]
+    return ImageSpecField(
+        source="image",
+        processors=[ResizeToFit(width, height, upscale=False)],
+        format=FORMATS[suffix],
+        options={"quality": quality},
+        cachefile_strategy=Deferred,
+    )
+
+
+def rendition_names():
+    return [name + suffix for name in RENDITIONS for suffix in FORMATS]
+
+
+def rendition_size(name, width, height):
+    """Pixel size ResizeToFit gives a width x height original for a rendition"""
+    max_width, max_height = RENDITIONS[name][:2]
+    ratios = [max_width / width] if max_width else []
+    if max_height:
+        ratios.append(max_height / height)
+    ratio = min(ratios)
+    if ratio >= 1:
+        return width, height
+    return int(round(width * ratio)), int(round(height * ratio))
+
+
+def file_digest(file):
+    """SHA-256 of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(digest, filename):
+    """Storage name of an original, so identical uploads share one file"""
+    extension = posixpath.splitext(filename)[1].lower()
+    return f"gallery/{digest[:2]}/{digest}{extension}"
+
+
+def store_original(storage, file, filename, digest=None):
+    """Save an upload under its content hash unless that copy already exists.
+
+    Returns (name, digest). Renditions are named after the original, so a
+    shared original also shares its renditions.
+    """
+    digest = digest or file_digest(file)
+    name = hashed_name(digest, filename)
+    if not storage.exists(name):
+        name = storage.save(name, file)
+    return name, digest
+
+
+def rendition_directory(name):
+    """Directory imagekit writes an original's renditions to"""
+    return posixpath.join(settings.IMAGEKIT_CACHEFILE_DIR, posixpath.splitext(name)[0])
+
+
+def generate_renditions(image_id, image_name):
+    """Write every rendition of an uploaded original; runs in a worker process.
+
+    Returns the original's pixel size so it can be stored with the row.
+    """
+    from .models import GalleryImage
+
+    image = GalleryImage(pk=image_id, image=image_name)
+    with image.image.open() as original, Image.open(original) as source:
+        size = source.size
+    for name in rendition_names():
+        getattr(image, name).generate(force=True)
+    return size
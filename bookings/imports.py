@@ -0,0 +1,190 @@
+import csv
+import io
+import os
+import threading
+import zipfile
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from PIL import Image, UnidentifiedImageError
+
+from .images import file_digest, store_original
+from .models import GalleryImage, Room
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+MANIFEST_NAME = "manifest.csv"
+
+ImportResult = namedtuple("ImportResult", ["created", "skipped"])
+
+
+def _directory_entries(root):
+    root = Path(root)
+    for path in sorted(root.rglob("*")):
+        if path.is_file():
+            yield path.relative_to(root).as_posix(), path.read_bytes
+
+
+@contextmanager
+def open_source(source):
+    """Yield (name, read) pairs for a ZIP file, ZIP upload or directory"""
+    if isinstance(source, (str, os.PathLike)) and Path(source).is_dir():
+        yield list(_directory_entries(source))
+        return
+    try:
+        zf = zipfile.ZipFile(source)
+    except zipfile.BadZipFile as exc:
+        raise ValueError(f"Not a ZIP file or directory: {exc}") from exc
+    # ZipFile reads lazily, so it stays open until every entry is read
+    with zf:
+        yield [
+            (info.filename, lambda info=info: zf.read(info))
+            for info in zf.infolist()
+            if not info.is_dir()
+        ]
+
+
+def read_manifest(data):
+    """Map file names to (room_number, order, is_primary) from manifest.csv.
+
+    Columns are ``file`` and ``room``, with optional ``order`` and
+    ``primary`` (1/true/yes).
+    """
+    rows = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    if not rows.fieldnames or not {"file", "room"} <= set(rows.fieldnames):
+        raise ValueError(f"{MANIFEST_NAME} needs 'file' and 'room' columns")
+    manifest = {}
+    for line, row in enumerate(rows, start=2):
+        order = (row.get("order") or "").strip()
+        if order and not order.isdigit():
+            raise ValueError(f"{MANIFEST_NAME} line {line}: bad order {order!r}")
+        manifest[row["file"].strip()] = (
+            row["room"].strip(),
+            int(order) if order else None,
+            (row.get("primary") or "").strip().lower() in {"1", "true", "yes"},
+        )
+    return manifest
+
+
+def _is_image(name):
+    path = PurePosixPath(name)
+    return path.suffix.lower() in IMAGE_EXTENSIONS and not any(
+        part.startswith((".", "__MACOSX")) for part in path.parts
+    )
+
+
+def _store(read, name, locks):
+    """Check that the bytes are an image and save them as a new original"""
+    data = read()
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as exc:
+        return None, f"not a valid image ({exc})"
+    content = ContentFile(data)
+    digest = file_digest(content)
+    storage = GalleryImage._meta.get_field("image").storage
+    # Copies of one photo in the archive must not race to write it twice
+    with locks.setdefault(digest, threading.Lock()):
+        return store_original(storage, content, name, digest), None
+
+
+def import_gallery(source, rooms=None, default_room=None, workers=None):
+    """Add every image in a ZIP or directory to the rooms' galleries.
+
+    A file listed in manifest.csv goes to that room; otherwise a file in a
+    folder named after a room number goes to that room, and any other file
+    to ``default_room``. Only rooms in ``rooms`` (default: all) are used.
+    Files are checked and stored by a thread pool and inserted with
+    bulk_create; the process_images worker builds their renditions.
+    """
+    with open_source(source) as entries:
+        readers = dict(entries)
+        manifest = (
+            read_manifest(readers.pop(MANIFEST_NAME)())
+            if MANIFEST_NAME in readers
+            else {}
+        )
+        jobs, skipped = _plan(readers, manifest, rooms, default_room)
+        locks = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            stored = list(
+                pool.map(lambda job: _store(readers[job[0]], job[0], locks), jobs)
+            )
+
+    # Unordered files go after the room's current images
+    next_order = dict(
+        GalleryImage.objects.filter(room__in={room for _, room, _, _ in jobs})
+        .values("room")
+        .annotate(last=Max("order") + 1)
+        .values_list("room", "last")
+    )
+    images, primaries = [], {}
+    # Photos already processed under the same content share their renditions
+    ready = {
+        row["image"]: row
+        for row in GalleryImage.objects.filter(
+            content_hash__in={result[1] for result, _ in stored if result},
+            processing_status=GalleryImage.READY,
+        ).values("image", "image_width", "image_height", "processed_at")
+    }
+    for (name, room, order, primary), (stored_as, error) in zip(jobs, stored):
+        if error:
+            skipped.append((name, error))
+            continue
+        if order is None:
+            order = next_order.get(room.pk, 0)
+        next_order[room.pk] = max(next_order.get(room.pk, 0), order + 1)
+        filename, digest = stored_as
+        twin = ready.get(filename, {})
+        image = GalleryImage(
+            room=room,
+            image=filename,
+            content_hash=digest,
+            title=PurePosixPath(name).stem[:100],
+            order=order,
+            processing_status=GalleryImage.READY if twin else GalleryImage.PENDING,
+            image_width=twin.get("image_width"),
+            image_height=twin.get("image_height"),
+            processed_at=twin.get("processed_at"),
+        )
+        if primary:
+            primaries[room.pk] = image
+        images.append(image)
+
+    for image in primaries.values():
+        image.is_primary = True
+    with transaction.atomic():
+        # bulk_create skips save(), so keep one primary per room here
+        GalleryImage.objects.filter(room__in=primaries, is_primary=True).update(
+            is_primary=False
+        )
+        GalleryImage.objects.bulk_create(images, batch_size=500)
+    return ImportResult(len(images), skipped)
+
+
+def _plan(readers, manifest, rooms, default_room):
+    """Pick a room, order and primary flag for every image file"""
+    names = [name for name in sorted(readers) if _is_image(name)]
+    rooms = Room.objects.all() if rooms is None else rooms
+    wanted = {manifest[name][0] if name in manifest else None for name in names}
+    wanted |= {PurePosixPath(name).parent.name for name in names}
+    by_number = rooms.in_bulk(wanted - {None, ""}, field_name="room_number")
+
+    jobs, skipped = [], []
+    for name in names:
+        if name in manifest:
+            room_number, order, primary = manifest[name]
+            room = by_number.get(room_number)
+        else:
+            room_number, order, primary = PurePosixPath(name).parent.name, None, False
+            room = by_number.get(room_number, default_room)
+        if room is None:
+            skipped.append((name, f"no room {room_number!r}"))
+        else:
+            jobs.append((name, room, order, primary))
+    return jobs, skipped
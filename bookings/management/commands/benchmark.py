@@ -0,0 +1,162 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from bookings.benchmarks import compare, default_scenarios, run_scenario
+from bookings.models import Booking, CustomUser, Room
+from bookings.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a separate benchmark database and time the booking views and "
+        "admin changelists through the test client: latency percentiles, "
+        "query counts and query time, optionally against a JSON baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios", nargs="*", help="Scenarios to run (default: all)"
+        )
+        parser.add_argument("--rooms", type=int, default=1000)
+        parser.add_argument("--bookings", type=int, default=100_000)
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument(
+            "--iterations", type=int, default=50, help="Timed requests per scenario"
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=5, help="Untimed requests per scenario"
+        )
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Keep the cache between requests instead of clearing it",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the benchmark database and reuse its data on the next run",
+        )
+        parser.add_argument(
+            "--db-name",
+            help="Benchmark database name (on SQLite, a file name lets --keepdb "
+            "reuse it; the default is in memory)",
+        )
+        parser.add_argument("--save-baseline", help="Write the results to this file")
+        parser.add_argument("--baseline", help="Compare against this results file")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Allowed median latency growth over the baseline (0.25 = 25%%)",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline: {exc}") from exc
+
+        if options["db_name"]:
+            connection.settings_dict["TEST"]["NAME"] = options["db_name"]
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"], serialize=False
+        )
+        try:
+            volumes = self.prepare(options)
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as file:
+                json.dump({"volumes": volumes, "scenarios": results}, file, indent=2)
+            self.stdout.write(f"Wrote {options['save_baseline']}")
+
+        if baseline is not None:
+            if baseline.get("volumes") != volumes:
+                self.stderr.write(
+                    self.style.WARNING(
+                        f"Baseline was recorded on {baseline.get('volumes')}"
+                    )
+                )
+            regressions = compare(
+                results, baseline.get("scenarios", {}), options["threshold"]
+            )
+            if regressions:
+                raise CommandError(
+                    "Regressed against the baseline:\n  " + "\n  ".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions"))
+
+    def prepare(self, options):
+        if not Room.objects.exists():
+            started = time.perf_counter()
+            written = generate(
+                options["rooms"], options["users"], bookings=options["bookings"]
+            )
+            self.stdout.write(
+                f"Seeded {written['rooms']} rooms, {written['guests']} users, "
+                f"{written['bookings']} bookings and {written['room_nights']} "
+                f"room-nights in {time.perf_counter() - started:.1f}s"
+            )
+        return {
+            "rooms": Room.objects.count(),
+            "users": CustomUser.objects.count(),
+            "bookings": Booking.objects.count(),
+        }
+
+    def run(self, options):
+        staff, _ = CustomUser.objects.get_or_create(
+            username="benchmark-admin",
+            defaults={
+                "is_staff": True,
+                "is_superuser": True,
+                "role": CustomUser.ADMIN,
+                "password": "!",
+            },
+        )
+        guest = CustomUser.objects.filter(role=CustomUser.CUSTOMER).first()
+        room = Room.objects.filter(is_active=True).first()
+        if guest is None or room is None:
+            raise CommandError("Seed at least one room and one user")
+
+        scenarios = default_scenarios(room, guest, staff)
+        if options["scenarios"]:
+            unknown = set(options["scenarios"]) - {s.name for s in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+            scenarios = [s for s in scenarios if s.name in options["scenarios"]]
+
+        self.stdout.write(
+            f"{'scenario':<18}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'db ms':>9}"
+        )
+        results = {}
+        for scenario in scenarios:
+            try:
+                result = run_scenario(
+                    scenario,
+                    options["iterations"],
+                    warmup=options["warmup"],
+                    clear_cache=not options["warm_cache"],
+                )
+            except ValueError as exc:
+                raise CommandError(exc) from exc
+            results[scenario.name] = result
+            self.stdout.write(
+                f"{scenario.name:<18}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+                f"{result['p99_ms']:>9.1f}{result['queries']:>9}"
+                f"{result['query_ms']:>9.1f}"
+            )
+        return results
@@ -0,0 +1,181 @@
+import asyncio
+import statistics
+import threading
+import time
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from bookings.benchmarks import percentile
+from bookings.models import Room
+
+HOST = "benchmark.local"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second and latency of the WSGI and ASGI handlers "
+        "in one process, with many concurrent clients on one worker"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="Paths to request (default: home, a room page and its booked dates)",
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument(
+            "--concurrency", type=int, default=200, help="Simultaneous clients"
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Request threads of the single WSGI worker",
+        )
+        parser.add_argument(
+            "--client-delay",
+            type=float,
+            default=0.0,
+            help="Seconds each client takes to read its response (slow clients)",
+        )
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or self.default_paths()
+        with override_settings(ALLOWED_HOSTS=[HOST]):
+            for path in paths:
+                self.stdout.write(self.style.MIGRATE_HEADING(path))
+                for name, run in (("WSGI", self.run_wsgi), ("ASGI", self.run_asgi)):
+                    elapsed, latencies, statuses = run(path, options)
+                    self.report(name, elapsed, latencies, statuses)
+
+    def default_paths(self):
+        room = Room.objects.filter(is_active=True).first()
+        if room is None:
+            raise CommandError("Create a room first, or pass paths to request")
+        return [
+            "/",
+            f"/room/{room.id}/",
+            f"/room/{room.id}/booked-dates/",
+        ]
+
+    def report(self, name, elapsed, latencies, statuses):
+        errors = sum(1 for status in statuses if status >= 500)
+        self.stdout.write(
+            f"  {name}: {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+            f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+            f"errors {errors}"
+        )
+
+    def run_wsgi(self, path, options):
+        """Clients share a fixed pool of worker threads, like one gthread worker"""
+        handler = WSGIHandler()
+        url = urlsplit(path)
+        workers = threading.Semaphore(options["threads"])
+        remaining = iter(range(options["requests"]))
+        lock = threading.Lock()
+        latencies, statuses = [], []
+
+        def client():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                started = time.perf_counter()
+                with workers:
+                    status = []
+                    environ = {
+                        "REQUEST_METHOD": "GET",
+                        "PATH_INFO": url.path,
+                        "QUERY_STRING": url.query,
+                        "SERVER_NAME": HOST,
+                        "SERVER_PORT": "80",
+                        "HTTP_HOST": HOST,
+                        "wsgi.url_scheme": "http",
+                        "wsgi.input": BytesIO(),
+                    }
+                    body = handler(environ, lambda s, h: status.append(int(s[:3])))
+                    # The worker thread stays busy until the client has read it
+                    b"".join(body)
+                    time.sleep(options["client_delay"])
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    statuses.append(status[0])
+            connections.close_all()
+
+        clients = [
+            threading.Thread(target=client) for _ in range(options["concurrency"])
+        ]
+        started = time.perf_counter()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        return time.perf_counter() - started, latencies, statuses
+
+    def run_asgi(self, path, options):
+        """Clients are coroutines on one event loop, like one uvicorn worker"""
+        handler = ASGIHandler()
+        url = urlsplit(path)
+        latencies, statuses = [], []
+
+        async def request():
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": url.path,
+                "raw_path": url.path.encode(),
+                "query_string": url.query.encode(),
+                "headers": [(b"host", HOST.encode())],
+                "client": ("127.0.0.1", 0),
+                "server": (HOST, 80),
+            }
+            disconnected = asyncio.Event()
+            sent = []
+
+            async def receive():
+                if not sent:
+                    sent.append(None)
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            status = []
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+                elif not message.get("more_body"):
+                    # Slow clients hold a socket here, not a thread
+                    await asyncio.sleep(options["client_delay"])
+
+            started = time.perf_counter()
+            await handler(scope, receive, send)
+            disconnected.set()
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status[0])
+
+        async def main():
+            remaining = iter(range(options["requests"]))
+
+            async def client():
+                while next(remaining, None) is not None:
+                    await request()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(options["concurrency"])))
+            return time.perf_counter() - started
+
+        elapsed = asyncio.run(main())
+        connections.close_all()
+        return elapsed, latencies, statuses
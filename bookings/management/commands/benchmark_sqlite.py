@@ -0,0 +1,155 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+
+from bookings.benchmarks import percentile
+from bookings.models import Booking, CustomUser, Room, RoomNotAvailable
+from bookings.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read and write throughput of the SQLite connection profiles "
+        "on a scratch database file, with concurrent readers and writers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            default=["default", "production"],
+            help="Profiles from settings.SQLITE_PROFILES to compare",
+        )
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument(
+            "--seconds", type=float, default=10, help="Duration of each run"
+        )
+        parser.add_argument("--rooms", type=int, default=100)
+        parser.add_argument("--bookings", type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The default database is not SQLite")
+        unknown = set(options["profiles"]) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+        if options["writers"] > options["rooms"]:
+            raise CommandError("Use at most one writer per room")
+
+        # WAL and locking need a real file, not the in-memory test database
+        directory = tempfile.mkdtemp()
+        connection.settings_dict["TEST"]["NAME"] = str(Path(directory, "bench.db"))
+        old_name = connection.settings_dict["NAME"]
+        old_options = connection.settings_dict["OPTIONS"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            generate(options["rooms"], 1000, bookings=options["bookings"])
+            self.stdout.write(
+                f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'failed':>8}"
+                f"{'read p99':>10}{'write p99':>11}"
+            )
+            for run, profile in enumerate(options["profiles"]):
+                self.use_profile(settings.SQLITE_PROFILES[profile])
+                result = self.run(options, run)
+                self.stdout.write(
+                    f"{profile:<12}{result['reads']:>10.1f}{result['writes']:>10.1f}"
+                    f"{result['failed']:>8}{result['read_p99']:>8.1f}ms"
+                    f"{result['write_p99']:>9.1f}ms"
+                )
+        finally:
+            self.use_profile(old_options)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def use_profile(self, sqlite_options):
+        # Every thread's connection shares this settings dict
+        connections.close_all()
+        connection.settings_dict["OPTIONS"] = dict(sqlite_options)
+        # WAL outlives the connection; start each profile from stock SQLite,
+        # while this is the only connection to the file
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=DELETE")
+        connection.close()
+
+    def run(self, options, run):
+        """Readers check rooms' dates while writers reserve free nights.
+
+        Each writer books its own rooms on dates no one else uses, so any
+        failed write is lock contention, not a taken room.
+        """
+        room_ids = list(Room.objects.values_list("id", flat=True))
+        guest = CustomUser.objects.first()
+        writers = options["writers"]
+        # Past the generated bookings, and past the previous profile's writes
+        first_free = timezone.localdate() + timedelta(days=400 + 2000 * run)
+        today = timezone.localdate()
+
+        deadline = time.perf_counter() + options["seconds"]
+        lock = threading.Lock()
+        read_times, write_times, failed = [], [], [0]
+
+        def reader():
+            rng = random.Random()
+            while time.perf_counter() < deadline:
+                # What room_detail, get_booked_dates and the booking form read
+                room = Room(pk=rng.choice(room_ids))
+                check_in = today + timedelta(days=rng.randrange(90))
+                started = time.perf_counter()
+                room.is_available(check_in, check_in + timedelta(days=3))
+                room.get_booked_ranges()
+                with lock:
+                    read_times.append(time.perf_counter() - started)
+            connections.close_all()
+
+        def writer(number):
+            own = room_ids[number::writers]
+            made = 0
+            while time.perf_counter() < deadline:
+                check_in = first_free + timedelta(days=2 * (made // len(own)))
+                booking = Booking(
+                    guest=guest,
+                    check_in=check_in,
+                    check_out=check_in + timedelta(days=1),
+                    num_adults=1,
+                )
+                room_id = own[made % len(own)]
+                made += 1
+                started = time.perf_counter()
+                try:
+                    Room.objects.get(pk=room_id).reserve(booking)
+                except (RoomNotAvailable, OperationalError):
+                    with lock:
+                        failed[0] += 1
+                    continue
+                with lock:
+                    write_times.append(time.perf_counter() - started)
+            connections.close_all()
+
+        threads = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        threads += [
+            threading.Thread(target=writer, args=(number,)) for number in range(writers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            "reads": len(read_times) / elapsed,
+            "writes": len(write_times) / elapsed,
+            "failed": failed[0],
+            "read_p99": percentile(read_times, 0.99) * 1000 if read_times else 0,
+            "write_p99": percentile(write_times, 0.99) * 1000 if write_times else 0,
+        }
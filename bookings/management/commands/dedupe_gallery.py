@@ -0,0 +1,114 @@
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bookings.images import file_digest, hashed_name, rendition_directory
+from bookings.models import GalleryImage
+
+# Left behind by the old synchronous thumbnail field
+LEGACY_THUMBNAILS = "gallery/thumbnails"
+
+
+def walk(storage, path):
+    """Every file name below a storage directory"""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+class Command(BaseCommand):
+    help = (
+        "Hash stored gallery originals, point every image at one copy per "
+        "content and delete the duplicate files and their renditions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be collapsed without changing anything",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Threads hashing files (default: one per CPU core)",
+        )
+
+    def handle(self, *args, **options):
+        storage = GalleryImage._meta.get_field("image").storage
+        names = set(
+            GalleryImage.objects.exclude(image="").values_list("image", flat=True)
+        )
+
+        def digest(name):
+            try:
+                with storage.open(name) as file:
+                    return name, file_digest(file)
+            except FileNotFoundError:
+                return name, None
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            digests = dict(pool.map(digest, sorted(names)))
+
+        moves = {}
+        for name, content_hash in digests.items():
+            if content_hash is None:
+                self.stderr.write(f"Missing file: {name}")
+            elif hashed_name(content_hash, name) != name:
+                moves[name] = (hashed_name(content_hash, name), content_hash)
+
+        # Moved originals, their renditions and the old thumbnail field's files
+        obsolete = list(moves) + list(walk(storage, LEGACY_THUMBNAILS))
+        obsolete += [
+            rendition
+            for name in moves
+            for rendition in walk(storage, rendition_directory(name))
+        ]
+        reclaimed = sum(storage.size(name) for name in obsolete)
+        self.stdout.write(
+            f"{len(names)} originals, {len(set(digests.values()) - {None})} "
+            f"unique; {len(moves)} to move, {len(obsolete)} files "
+            f"({reclaimed / 2**20:.1f} MiB) to delete"
+        )
+        if options["dry_run"]:
+            return
+
+        for name, (target, content_hash) in moves.items():
+            if not storage.exists(target):
+                with storage.open(name) as file:
+                    storage.save(target, file)
+        self.repoint(moves)
+        # Hashes of images already under their hashed name
+        for name, content_hash in digests.items():
+            if content_hash and name not in moves:
+                GalleryImage.objects.filter(image=name, content_hash="").update(
+                    content_hash=content_hash
+                )
+        for name in obsolete:
+            storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {len(obsolete)} files"))
+
+    @transaction.atomic
+    def repoint(self, moves):
+        for name, (target, content_hash) in moves.items():
+            # Renditions follow the original's name: reuse a processed copy
+            # of the target, else queue it once for process_images
+            twin = GalleryImage.objects.filter(
+                image=target, processing_status=GalleryImage.READY
+            ).first()
+            GalleryImage.objects.filter(image=name).update(
+                image=target,
+                content_hash=content_hash,
+                processing_status=GalleryImage.READY if twin else GalleryImage.PENDING,
+                image_width=twin and twin.image_width,
+                image_height=twin and twin.image_height,
+                processed_at=twin and twin.processed_at,
+            )
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from bookings.models import Booking, CustomUser, Room
+
+
+class Command(BaseCommand):
+    help = "Print the query plan for each availability and changelist lookup"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--room", type=int, help="Room id to plan lookups for")
+        parser.add_argument(
+            "--nights",
+            type=int,
+            default=3,
+            help="Length of the stay used for the search lookups",
+        )
+
+    def handle(self, *args, **options):
+        room = (
+            Room.objects.filter(id=options["room"]).first()
+            if options["room"]
+            else Room.objects.first()
+        )
+        if room is None:
+            raise CommandError("No room found to plan lookups for")
+
+        check_in = timezone.now().date()
+        check_out = check_in + timedelta(days=options["nights"])
+        guest = CustomUser.objects.first()
+
+        queries = [
+            (
+                "home: available rooms",
+                Room.objects.filter(
+                    is_active=True, capacity_adults__gte=1, capacity_children__gte=0
+                ).available_between(check_in, check_out),
+            ),
+            (
+                "Room.availability",
+                Room._held_stays([room.id], [(check_in, check_out)]),
+            ),
+            (
+                "get_booked_dates: booked ranges",
+                room.bookings.filter(
+                    status__in=Booking.ACTIVE_STATUSES, check_out__gte=check_in
+                )
+                .order_by("check_in")
+                .values_list("check_in", "check_out"),
+            ),
+            (
+                "get_booked_dates: ETag",
+                Room.objects.filter(id=room.id)
+                .values("id")
+                .annotate(
+                    found=Count("id"),
+                    last_change=Max("bookings__updated_at"),
+                    count=Count("bookings"),
+                ),
+            ),
+            ("BookingAdmin: all reservations", Booking.objects.all()),
+            (
+                "BookingAdmin: team reservations",
+                Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES),
+            ),
+            (
+                "BookingAdmin: guest reservations",
+                Booking.objects.filter(guest=guest),
+            ),
+            (
+                "BookingAdmin: guest autocomplete",
+                CustomUser.objects.alias(
+                    username_lower=Lower("username"), email_lower=Lower("email")
+                )
+                .filter(
+                    Q(username_lower__gte="a", username_lower__lt="a\uffff")
+                    | Q(email_lower__gte="a", email_lower__lt="a\uffff")
+                )
+                .order_by("username"),
+            ),
+            (
+                "BookingAdmin: room autocomplete",
+                Room.objects.alias(room_number_lower=Lower("room_number"))
+                .filter(room_number_lower__gte="1", room_number_lower__lt="1\uffff")
+                .order_by("room_number"),
+            ),
+        ]
+
+        for label, queryset in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
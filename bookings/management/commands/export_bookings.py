@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from bookings.exports import iter_bookings_csv
+from bookings.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Stream reservations with room and guest details as CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=[status for status, _ in Booking.STATUS_CHOICES],
+            help="Only export this status (repeatable)",
+        )
+        parser.add_argument("--check-in-from", help="Earliest check-in (YYYY-MM-DD)")
+        parser.add_argument("--check-in-to", help="Latest check-in (YYYY-MM-DD)")
+        parser.add_argument("--check-out-from", help="Earliest check-out (YYYY-MM-DD)")
+        parser.add_argument("--check-out-to", help="Latest check-out (YYYY-MM-DD)")
+        parser.add_argument("--output", help="Write to this file instead of stdout")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        # Same filters as the BookingAdmin changelist
+        bookings = Booking.objects.order_by("-booking_date")
+        if options["status"]:
+            bookings = bookings.filter(status__in=options["status"])
+        for option, lookup in (
+            ("check_in_from", "check_in__gte"),
+            ("check_in_to", "check_in__lte"),
+            ("check_out_from", "check_out__gte"),
+            ("check_out_to", "check_out__lte"),
+        ):
+            if options[option]:
+                bookings = bookings.filter(**{lookup: options[option]})
+
+        lines = iter_bookings_csv(bookings, chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.stats import rebuild_daily_stats
+from bookings.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic rooms, guests and years of "
+        "non-overlapping booking history for load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=200)
+        parser.add_argument("--guests", type=int, default=20_000)
+        parser.add_argument(
+            "--years", type=int, default=3, help="Years of booking history"
+        )
+        parser.add_argument(
+            "--future-days",
+            type=int,
+            default=180,
+            help="How far ahead upcoming bookings reach",
+        )
+        parser.add_argument(
+            "--occupancy",
+            type=float,
+            default=0.7,
+            help="Average share of nights sold (0-1); seasons vary around it",
+        )
+        parser.add_argument(
+            "--bookings",
+            type=int,
+            help="Stop at this many bookings, extending history as needed",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Bookings written per transaction",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed, for repeatable data"
+        )
+        parser.add_argument(
+            "--no-stats",
+            action="store_true",
+            help="Skip rebuilding the dashboard's daily stats afterwards",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options["occupancy"] <= 1:
+            raise CommandError("--occupancy must be between 0 and 1")
+
+        started = time.perf_counter()
+        written = generate(
+            options["rooms"],
+            options["guests"],
+            years=options["years"],
+            future_days=options["future_days"],
+            occupancy=options["occupancy"],
+            bookings=options["bookings"],
+            batch_size=options["batch_size"],
+            random_seed=options["seed"],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {written['rooms']} rooms, {written['guests']} guests, "
+                f"{written['bookings']} bookings and {written['room_nights']} "
+                f"room-nights in {elapsed:.1f}s "
+                f"({written['bookings'] / max(elapsed, 0.001):,.0f} bookings/s)"
+            )
+        )
+        if not options["no_stats"]:
+            rows = rebuild_daily_stats()
+            self.stdout.write(f"Rebuilt {rows} daily stats rows")
@@ -0,0 +1,62 @@
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.imports import MANIFEST_NAME, import_gallery
+from bookings.models import Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Add the images in a ZIP file or directory to room galleries. Files "
+        f"are mapped by {MANIFEST_NAME} (file,room,order,primary), else by a "
+        "folder named after the room number, else to --room"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="ZIP file or directory of images")
+        parser.add_argument(
+            "--room", help="Room number for files the manifest and folders miss"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Parallel workers for storing and resizing (default: CPU cores)",
+        )
+        parser.add_argument(
+            "--no-process",
+            action="store_true",
+            help="Leave the renditions to a running process_images worker",
+        )
+
+    def handle(self, *args, **options):
+        default_room = None
+        if options["room"]:
+            default_room = Room.objects.filter(room_number=options["room"]).first()
+            if default_room is None:
+                raise CommandError(f"No room {options['room']!r}")
+
+        try:
+            result = import_gallery(
+                options["source"],
+                default_room=default_room,
+                workers=options["workers"],
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc) from exc
+
+        for name, reason in result.skipped:
+            self.stderr.write(f"Skipped {name}: {reason}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {result.created} images")
+            + (f", skipped {len(result.skipped)}" if result.skipped else "")
+        )
+        if result.created and not options["no_process"]:
+            call_command(
+                "process_images",
+                once=True,
+                workers=options["workers"],
+                stdout=self.stdout,
+            )
@@ -0,0 +1,125 @@
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from bookings.images import generate_renditions
+from bookings.models import GalleryImage
+
+
+class InlineExecutor:
+    """Executor that runs each job in this process as it is submitted"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:  # pylint: disable=broad-except
+            future.set_exception(exc)
+        return future
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the thumbnail and width renditions (JPEG and WebP) of uploaded "
+        "gallery images, using a pool of worker processes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Worker processes (default: one per CPU core); 0 builds in "
+            "this process",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Images claimed per round (default: four per worker)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of polling",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls of an empty queue",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        batch_size = options["batch_size"] or max(workers, 1) * 4
+
+        # Images a crashed worker left half-done go back in the queue
+        GalleryImage.objects.filter(processing_status=GalleryImage.PROCESSING).update(
+            processing_status=GalleryImage.PENDING
+        )
+
+        if workers:
+            # Children must not share the parent's database connections
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=django.setup
+            )
+        else:
+            executor = InlineExecutor()
+        with executor as pool:
+            while True:
+                jobs = self.claim(batch_size)
+                if jobs:
+                    self.run(pool, jobs)
+                elif options["once"]:
+                    break
+                else:
+                    time.sleep(options["poll_interval"])
+
+    def claim(self, batch_size):
+        pending = GalleryImage.objects.filter(
+            processing_status=GalleryImage.PENDING
+        ).order_by("upload_date")[:batch_size]
+        jobs = {}
+        for image_id, name in pending.values_list("id", "image"):
+            # The conditional update makes each claim safe between workers
+            if GalleryImage.objects.filter(
+                id=image_id, processing_status=GalleryImage.PENDING
+            ).update(processing_status=GalleryImage.PROCESSING):
+                # Rows sharing an original share its renditions: build once
+                jobs.setdefault(name, image_id)
+        return [(image_id, name) for name, image_id in jobs.items()]
+
+    def run(self, pool, jobs):
+        futures = {pool.submit(generate_renditions, *job): job for job in jobs}
+        processed = 0
+        for future in as_completed(futures):
+            image_id, name = futures[future]
+            try:
+                width, height = future.result()
+            except Exception as exc:  # pylint: disable=broad-except
+                result = {"processing_status": GalleryImage.FAILED}
+                self.stderr.write(f"Image {image_id} ({name}) failed: {exc}")
+            else:
+                result = {
+                    "processing_status": GalleryImage.READY,
+                    "image_width": width,
+                    "image_height": height,
+                }
+            # A re-upload while this ran is left pending for the next round
+            processed += GalleryImage.objects.filter(
+                image=name, processing_status=GalleryImage.PROCESSING
+            ).update(processed_at=timezone.now(), **result)
+        self.stdout.write(f"Processed {processed} images ({len(jobs)} originals)")
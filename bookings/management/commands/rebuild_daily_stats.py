@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from bookings.stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily occupancy and revenue table behind the admin "
+        "dashboard from the bookings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=92,
+            help="Dates recomputed per transaction",
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_stats(chunk_days=options["chunk_days"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily stats rows"))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bookings.models import Booking, RoomNight
+
+
+class Command(BaseCommand):
+    help = "Rebuild the room-night inventory from active bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of room-night rows written per insert",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        bookings = Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES).only(
+            "id", "room_id", "check_in", "check_out"
+        )
+
+        expected = 0
+        with transaction.atomic():
+            RoomNight.objects.all().delete()
+            batch = []
+            for booking in bookings.iterator(chunk_size=batch_size):
+                for day in booking.get_occupied_dates():
+                    batch.append(
+                        RoomNight(room_id=booking.room_id, booking=booking, date=day)
+                    )
+                if len(batch) >= batch_size:
+                    expected += len(batch)
+                    RoomNight.objects.bulk_create(batch, ignore_conflicts=True)
+                    batch = []
+            expected += len(batch)
+            RoomNight.objects.bulk_create(batch, ignore_conflicts=True)
+
+        written = RoomNight.objects.count()
+        if written < expected:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Skipped {expected - written} room-nights held by overlapping bookings"
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} room-nights"))
@@ -0,0 +1,205 @@
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# [query count, query seconds] of the request being handled, if any
+_request_queries = ContextVar("request_queries", default=None)
+_current_request = ContextVar("current_request", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    usage = _request_queries.get()
+    if usage is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        usage[0] += 1
+        usage[1] += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # Async views query from executor threads, each with its own connection;
+    # the context variable follows the request into them
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bucket, count in zip([*self.buckets, "+Inf"], self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.query_seconds = 0.0
+        self.responses = Counter()
+
+
+class Registry:
+    """Per-view request metrics of this process, in Prometheus text format.
+
+    Each worker process keeps its own; Prometheus sums them across targets.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.views = {}
+
+    def record(self, view, method, status, seconds, queries, query_seconds):
+        with self.lock:
+            metrics = self.views.get((view, method))
+            if metrics is None:
+                metrics = self.views[view, method] = ViewMetrics()
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(queries)
+            metrics.query_seconds += query_seconds
+            metrics.responses[status] += 1
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def render(self):
+        with self.lock:
+            views = [
+                (labels(view=view, method=method), metrics)
+                for (view, method), metrics in sorted(self.views.items())
+            ]
+            lines = [
+                "# HELP hotel_requests_total Responses by view, method and status.",
+                "# TYPE hotel_requests_total counter",
+            ]
+            for label, metrics in views:
+                for status, count in sorted(metrics.responses.items()):
+                    lines.append(
+                        f'hotel_requests_total{{{label},status="{status}"}} {count}'
+                    )
+            lines += [
+                "# HELP hotel_request_duration_seconds Time to build the response.",
+                "# TYPE hotel_request_duration_seconds histogram",
+            ]
+            for label, metrics in views:
+                lines += metrics.latency.lines("hotel_request_duration_seconds", label)
+            lines += [
+                "# HELP hotel_request_queries Database queries per request.",
+                "# TYPE hotel_request_queries histogram",
+            ]
+            for label, metrics in views:
+                lines += metrics.queries.lines("hotel_request_queries", label)
+            lines += [
+                "# HELP hotel_db_query_seconds_total Time spent in database queries.",
+                "# TYPE hotel_db_query_seconds_total counter",
+            ]
+            for label, metrics in views:
+                lines.append(
+                    f"hotel_db_query_seconds_total{{{label}}} {metrics.query_seconds}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def labels(**values):
+    return ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in values.items()
+    )
+
+
+registry = Registry()
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    # Unmatched paths share one label, so 404 scans cannot grow the registry
+    return match.view_name if match else "<unresolved>"
+
+
+def current_view():
+    """URL name of the request being handled, or None outside requests"""
+    request = _current_request.get()
+    return view_name(request) if request is not None else None
+
+
+class MetricsMiddleware:
+    """Record latency, query count and query time per URL name.
+
+    Runs natively in both sync and async stacks, so it adds no thread hop
+    in front of the async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        usage = [0, 0.0]
+        token = _request_queries.set(usage)
+        request_token = _current_request.set(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+            _current_request.reset(request_token)
+        self.record(request, response, time.perf_counter() - started, usage)
+        return response
+
+    async def __acall__(self, request):
+        usage = [0, 0.0]
+        token = _request_queries.set(usage)
+        request_token = _current_request.set(request)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+            _current_request.reset(request_token)
+        self.record(request, response, time.perf_counter() - started, usage)
+        return response
+
+    def record(self, request, response, seconds, usage):
+        registry.record(
+            view_name(request),
+            request.method if request.method in METHODS else "other",
+            response.status_code,
+            seconds,
+            *usage,
+        )
@@ -0,0 +1,92 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:47
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_room_nights(apps, schema_editor):
+    Booking = apps.get_model("bookings", "Booking")
+    RoomNight = apps.get_model("bookings", "RoomNight")
+    nights = []
+    for booking in Booking.objects.filter(status__in=["pending", "confirmed"]):
+        days = (booking.check_out - booking.check_in).days
+        nights.extend(
+            RoomNight(
+                room_id=booking.room_id,
+                booking_id=booking.id,
+                date=booking.check_in + timedelta(days=i),
+            )
+            for i in range(days + 1)
+        )
+    RoomNight.objects.bulk_create(nights, batch_size=5000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "bookings",
+            "0004_remove_room_images_galleryimage_delete_roomgallery_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="booking",
+            options={
+                "ordering": ["-booking_date"],
+                "verbose_name": "Reservation",
+                "verbose_name_plural": "Reservations",
+            },
+        ),
+        migrations.CreateModel(
+            name="RoomNight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="Date")),
+                (
+                    "booking",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="nights",
+                        to="bookings.booking",
+                        verbose_name="Booking",
+                    ),
+                ),
+                (
+                    "room",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="nights",
+                        to="bookings.room",
+                        verbose_name="Room",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Room Night",
+                "verbose_name_plural": "Room Nights",
+                "indexes": [
+                    models.Index(
+                        fields=["date", "room"], name="room_night_date_room_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("room", "date"), name="unique_room_night"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_room_nights, migrations.RunPython.noop),
+    ]
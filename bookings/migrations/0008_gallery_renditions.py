@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookings", "0007_autocomplete_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="galleryimage",
+            name="thumbnail",
+        ),
+        migrations.AddField(
+            model_name="galleryimage",
+            name="processed_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Processed At"
+            ),
+        ),
+        migrations.AddField(
+            model_name="galleryimage",
+            name="processing_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("processing", "Processing"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                db_index=True,
+                default="pending",
+                max_length=10,
+                verbose_name="Processing Status",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="galleryimage",
+            name="image",
+            field=models.ImageField(upload_to="gallery/", verbose_name="Image"),
+        ),
+    ]
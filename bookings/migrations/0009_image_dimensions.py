@@ -0,0 +1,36 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+def requeue_images(apps, schema_editor):
+    # Processed images lack the width renditions and their size
+    GalleryImage = apps.get_model("bookings", "GalleryImage")
+    GalleryImage.objects.exclude(processing_status="pending").update(
+        processing_status="pending"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookings", "0008_gallery_renditions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="galleryimage",
+            name="image_height",
+            field=models.PositiveIntegerField(
+                blank=True, editable=False, null=True, verbose_name="Image Height"
+            ),
+        ),
+        migrations.AddField(
+            model_name="galleryimage",
+            name="image_width",
+            field=models.PositiveIntegerField(
+                blank=True, editable=False, null=True, verbose_name="Image Width"
+            ),
+        ),
+        migrations.RunPython(requeue_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookings", "0009_image_dimensions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="galleryimage",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                max_length=64,
+                verbose_name="Content Hash",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookings", "0010_gallery_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="Date")),
+                (
+                    "room_type",
+                    models.CharField(
+                        choices=[
+                            ("single", "Single"),
+                            ("double", "Double"),
+                            ("suite", "Suite"),
+                            ("family", "Family"),
+                        ],
+                        max_length=10,
+                        verbose_name="Room Type",
+                    ),
+                ),
+                (
+                    "rooms_sold",
+                    models.PositiveIntegerField(default=0, verbose_name="Rooms Sold"),
+                ),
+                (
+                    "room_revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=12,
+                        verbose_name="Room Revenue",
+                    ),
+                ),
+                (
+                    "nights_booked",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nights Booked"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily Stats",
+                "verbose_name_plural": "Daily Stats",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "room_type"), name="unique_daily_stats"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:12
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookings", "0011_daily_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RateRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, verbose_name="Name")),
+                (
+                    "room_type",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("single", "Single"),
+                            ("double", "Double"),
+                            ("suite", "Suite"),
+                            ("family", "Family"),
+                        ],
+                        help_text="Leave blank to apply to every room type",
+                        max_length=10,
+                        verbose_name="Room Type",
+                    ),
+                ),
+                ("start_date", models.DateField(verbose_name="First Night")),
+                ("end_date", models.DateField(verbose_name="Last Night")),
+                (
+                    "weekdays",
+                    models.CharField(
+                        blank=True,
+                        help_text="Comma-separated weekday numbers, 0 = Monday; blank for all",
+                        max_length=20,
+                        verbose_name="Weekdays",
+                    ),
+                ),
+                (
+                    "multiplier",
+                    models.DecimalField(
+                        decimal_places=3,
+                        default=1,
+                        max_digits=5,
+                        validators=[django.core.validators.MinValueValidator(0)],
+                        verbose_name="Price Multiplier",
+                    ),
+                ),
+                ("is_active", models.BooleanField(default=True, verbose_name="Active")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated At"),
+                ),
+            ],
+            options={
+                "verbose_name": "Rate Rule",
+                "verbose_name_plural": "Rate Calendar",
+                "ordering": ["start_date", "name"],
+                "indexes": [
+                    models.Index(
+                        fields=["is_active", "start_date", "end_date"],
+                        name="rate_rule_window_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,12 +1,34 @@
 # bookings/models.py
 
-from django.db import models
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.db import IntegrityError, OperationalError, models, transaction
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.templatetags.static import static
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
-from imagekit.models import ProcessedImageField
-from imagekit.processors import ResizeToFit
+
+from .images import (
+    PLACEHOLDER,
+    PLACEHOLDER_SIZE,
+    SRCSET_WIDTHS,
+    rendition_field,
+    rendition_names,
+    rendition_size,
+    store_original,
+)
+
+
+class RoomNotAvailable(Exception):
+    """Raised when a reservation loses the race for a room's dates"""
 
 
 class CustomUser(AbstractUser):
@@ -53,6 +75,11 @@ class CustomUser(AbstractUser):
     class Meta:
         verbose_name = _("User")
         verbose_name_plural = _("Users")
+        indexes = [
+            # Prefix lookups from the BookingAdmin guest autocomplete
+            models.Index(Lower("username"), name="user_username_lower_idx"),
+            models.Index(Lower("email"), name="user_email_lower_idx"),
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
@@ -61,22 +88,48 @@ class CustomUser(AbstractUser):
 class GalleryImage(models.Model):
     """Model for hotel images"""
 
-    image = ProcessedImageField(
-        upload_to="gallery/",
-        processors=[ResizeToFit(1920, 1080)],
-        format="JPEG",
-        options={"quality": 85},
-        verbose_name=_("Image"),
-    )
-    thumbnail = ProcessedImageField(
-        upload_to="gallery/thumbnails/",
-        processors=[ResizeToFit(300, 300)],
-        format="JPEG",
-        options={"quality": 80},
-        verbose_name=_("Thumbnail"),
-        null=True,
+    PENDING = "pending"
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+    PROCESSING_CHOICES = [
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (READY, "Ready"),
+        (FAILED, "Failed"),
+    ]
+
+    # The original is stored as uploaded; see bookings.images for renditions
+    image = models.ImageField(upload_to="gallery/", verbose_name=_("Image"))
+    thumbnail = rendition_field("thumbnail")
+    thumbnail_webp = rendition_field("thumbnail", "_webp")
+    w320 = rendition_field("w320")
+    w320_webp = rendition_field("w320", "_webp")
+    w640 = rendition_field("w640")
+    w640_webp = rendition_field("w640", "_webp")
+    w960 = rendition_field("w960")
+    w960_webp = rendition_field("w960", "_webp")
+    w1280 = rendition_field("w1280")
+    w1280_webp = rendition_field("w1280", "_webp")
+    w1920 = rendition_field("w1920")
+    w1920_webp = rendition_field("w1920", "_webp")
+    # SHA-256 of the original; identical uploads share one stored file
+    content_hash = models.CharField(
+        max_length=64,
         blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name=_("Content Hash"),
+    )
+    # Size of the original, filled in by the worker for width/height attributes
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name=_("Image Width")
     )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name=_("Image Height")
+    )
+
     title = models.CharField(max_length=100, blank=True, verbose_name=_("Title"))
     room = models.ForeignKey(
         "Room",
@@ -91,6 +144,16 @@ class GalleryImage(models.Model):
         default=timezone.now, verbose_name=_("Upload Date")
     )
     order = models.PositiveIntegerField(default=0, verbose_name=_("Display Order"))
+    processing_status = models.CharField(
+        max_length=10,
+        choices=PROCESSING_CHOICES,
+        default=PENDING,
+        db_index=True,
+        verbose_name=_("Processing Status"),
+    )
+    processed_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Processed At")
+    )
 
     class Meta:
         verbose_name = _("Gallery Image")
@@ -101,8 +164,27 @@ class GalleryImage(models.Model):
         return f"{self.title or 'Image'} - {self.upload_date.strftime('%Y-%m-%d')}"
 
     def save(self, *args, **kwargs):
-        if self.image and not self.thumbnail:
-            self.thumbnail = self.image
+        if self.image and not self.image._committed:
+            self.image.name, self.content_hash = store_original(
+                self.image.storage, self.image.file, self.image.name
+            )
+            self.image._committed = True
+            # Reuse the renditions of an identical upload, else the
+            # process_images worker builds them
+            twin = (
+                GalleryImage.objects.filter(
+                    content_hash=self.content_hash,
+                    image=self.image.name,
+                    processing_status=self.READY,
+                )
+                .exclude(pk=self.pk)
+                .values("image_width", "image_height", "processed_at")
+                .first()
+            )
+            self.processing_status = self.READY if twin else self.PENDING
+            self.image_width = twin and twin["image_width"]
+            self.image_height = twin and twin["image_height"]
+            self.processed_at = twin and twin["processed_at"]
         if self.is_primary and self.room:
             # Ensure only one primary image per room
             GalleryImage.objects.filter(room=self.room, is_primary=True).exclude(
@@ -110,6 +192,120 @@ class GalleryImage(models.Model):
             ).update(is_primary=False)
         super().save(*args, **kwargs)
 
+    @property
+    def is_ready(self):
+        return self.processing_status == self.READY
+
+    @cached_property
+    def renditions(self):
+        """Rendition URLs by name, all pointing at a placeholder until ready"""
+        if not self.is_ready:
+            return dict.fromkeys(rendition_names(), static(PLACEHOLDER))
+        return {name: getattr(self, name).url for name in rendition_names()}
+
+    def rendition_size(self, name):
+        """(width, height) of a rendition, or of the placeholder until ready"""
+        if not self.is_ready or not self.image_width:
+            return PLACEHOLDER_SIZE
+        return rendition_size(name, self.image_width, self.image_height)
+
+    def _srcset(self, suffix):
+        if not self.is_ready:
+            return ""
+        candidates = {}
+        for name in SRCSET_WIDTHS:
+            # Renditions of a small original stop growing; offer each size once
+            width = self.rendition_size(name)[0]
+            candidates.setdefault(width, self.renditions[name + suffix])
+        return ", ".join(f"{url} {width}w" for width, url in candidates.items())
+
+    @cached_property
+    def srcset(self):
+        return self._srcset("")
+
+    @cached_property
+    def srcset_webp(self):
+        return self._srcset("_webp")
+
+    @cached_property
+    def display_size(self):
+        """Intrinsic size for <img width/height>, so layout never shifts"""
+        return self.rendition_size("w640")
+
+    @cached_property
+    def thumbnail_size(self):
+        return self.rendition_size("thumbnail")
+
+
+class RoomQuerySet(models.QuerySet):
+    def available_between(self, check_in, check_out):
+        """Exclude rooms with any occupied date in the requested range"""
+        occupied = RoomNight.objects.filter(date__range=(check_in, check_out))
+        return self.exclude(id__in=occupied.values("room_id"))
+
+    def _stays_in_window(self, first, last):
+        return Booking.objects.filter(
+            room__in=self,
+            status__in=Booking.ACTIVE_STATUSES,
+            check_in__lte=last,
+            check_out__gte=first,
+        ).values_list("room_id", "check_in", "check_out")
+
+    @staticmethod
+    def _sweep_open_check_ins(room_ids, stays, first, last, nights):
+        """Check-in dates first..last whose stay touches no held date.
+
+        Each stay adds +1/-1 at the edges of its held dates (check-out day
+        included, as in RoomNight) in a per-room difference array. One pass
+        turns it into a running count of held dates, after which any
+        candidate stay is checked with a single subtraction.
+        """
+        if last < first:
+            # The whole window is in the past: no check-in dates are left
+            return {}
+        size = (last - first).days + nights + 1
+        edges = {room_id: [0] * (size + 1) for room_id in room_ids}
+        for room_id, check_in, check_out in stays:
+            edges[room_id][max((check_in - first).days, 0)] += 1
+            edges[room_id][min((check_out - first).days, size - 1) + 1] -= 1
+
+        open_check_ins = {}
+        for room_id, room_edges in edges.items():
+            held = [0, *accumulate(count > 0 for count in accumulate(room_edges))]
+            days = [
+                first + timedelta(days=i)
+                for i in range((last - first).days + 1)
+                if held[i + nights + 1] == held[i]
+            ]
+            if days:
+                open_check_ins[room_id] = days
+        return open_check_ins
+
+    def open_check_ins(self, first, last, nights):
+        """{room id: check-in dates first..last free for ``nights`` nights}
+
+        Reads the room ids and the overlapping bookings once, whatever the
+        number of candidate dates.
+        """
+        window_end = last + timedelta(days=nights)
+        return self._sweep_open_check_ins(
+            list(self.values_list("id", flat=True)),
+            list(self._stays_in_window(first, window_end)),
+            first,
+            last,
+            nights,
+        )
+
+    async def aopen_check_ins(self, first, last, nights):
+        window_end = last + timedelta(days=nights)
+        return self._sweep_open_check_ins(
+            [room_id async for room_id in self.values_list("id", flat=True)],
+            [stay async for stay in self._stays_in_window(first, window_end)],
+            first,
+            last,
+            nights,
+        )
+
 
 class Room(models.Model):
     """Model for hotel rooms"""
@@ -201,25 +397,239 @@ class Room(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
 
+    objects = RoomQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Room")
         verbose_name_plural = _("Rooms")
         ordering = ["room_number"]
+        indexes = [
+            # Prefix lookups from the BookingAdmin room autocomplete
+            models.Index(Lower("room_number"), name="room_number_lower_idx"),
+        ]
 
     def __str__(self):
         return f"{self.room_number} - {self.name}"
 
+    @cached_property
+    def gallery_images(self):
+        """Images in display order, read from prefetch_related("images") if present"""
+        return list(self.images.all())
+
     def get_primary_image(self):
-        return self.images.filter(is_primary=True).first() or self.images.first()
+        images = self.gallery_images
+        return next((image for image in images if image.is_primary), None) or next(
+            iter(images), None
+        )
 
     def get_all_images(self):
-        return self.images.all().order_by("order")
+        return self.gallery_images
+
+    def is_available(self, check_in, check_out, exclude_booking=None):
+        stay = (check_in, check_out)
+        return Room.availability([self.pk], [stay], exclude_booking)[self.pk][stay]
+
+    @staticmethod
+    def _held_stays(room_ids, ranges, exclude_booking=None):
+        stays = Booking.objects.filter(
+            room_id__in=room_ids,
+            status__in=Booking.ACTIVE_STATUSES,
+            check_in__lte=max(check_out for _, check_out in ranges),
+            check_out__gte=min(check_in for check_in, _ in ranges),
+        )
+        if exclude_booking is not None and exclude_booking.pk:
+            stays = stays.exclude(pk=exclude_booking.pk)
+        # The sweep sorts in memory; skip the default booking_date ordering
+        return stays.order_by().values_list("room_id", "check_in", "check_out")
+
+    @classmethod
+    def _sweep_availability(cls, room_ids, ranges, stays):
+        """{room id: {(check_in, check_out): free}} from the rooms' held stays.
+
+        Each room's stays are sorted and merged into disjoint held spans
+        (check-out day included, as in RoomNight). A requested range is
+        then free unless the last span starting on or before its check-out
+        ends on or after its check-in: one bisect per room and range.
+        """
+        by_room = defaultdict(list)
+        for room_id, check_in, check_out in stays:
+            by_room[room_id].append((check_in, check_out))
+
+        availability = {}
+        for room_id in room_ids:
+            held = cls._merge_stays(sorted(by_room[room_id]))
+            starts = [start for start, _ in held]
+            free = availability[room_id] = {}
+            for check_in, check_out in ranges:
+                i = bisect_right(starts, check_out)
+                free[check_in, check_out] = i == 0 or held[i - 1][1] < check_in
+        return availability
+
+    @classmethod
+    def availability(cls, room_ids, ranges, exclude_booking=None):
+        """Whether each room is free for each (check_in, check_out) range.
+
+        Returns {room id: {(check_in, check_out): bool}} from one query over
+        the active bookings spanning all the ranges, however many rooms and
+        ranges are asked about.
+        """
+        room_ids, ranges = list(room_ids), list(ranges)
+        if not room_ids or not ranges:
+            return {room_id: {} for room_id in room_ids}
+        return cls._sweep_availability(
+            room_ids, ranges, list(cls._held_stays(room_ids, ranges, exclude_booking))
+        )
+
+    @classmethod
+    async def aavailability(cls, room_ids, ranges, exclude_booking=None):
+        room_ids, ranges = list(room_ids), list(ranges)
+        if not room_ids or not ranges:
+            return {room_id: {} for room_id in room_ids}
+        stays = cls._held_stays(room_ids, ranges, exclude_booking)
+        return cls._sweep_availability(room_ids, ranges, [stay async for stay in stays])
+
+    def _booked_stays(self, since):
+        return (
+            self.bookings.filter(
+                status__in=Booking.ACTIVE_STATUSES,
+                check_out__gte=since or timezone.now().date(),
+            )
+            .order_by("check_in")
+            .values_list("check_in", "check_out")
+        )
+
+    @staticmethod
+    def _merge_stays(stays):
+        ranges = []
+        for check_in, check_out in stays:
+            if ranges and check_in <= ranges[-1][1] + timedelta(days=1):
+                ranges[-1][1] = max(ranges[-1][1], check_out)
+            else:
+                ranges.append([check_in, check_out])
+        return ranges
+
+    def get_booked_ranges(self, since=None):
+        """Merged [start, end] date ranges held by active bookings"""
+        return self._merge_stays(self._booked_stays(since))
+
+    async def aget_booked_ranges(self, since=None):
+        return self._merge_stays([stay async for stay in self._booked_stays(since)])
+
+    def reserve(self, booking, retries=5):
+        """Save ``booking`` for this room or raise RoomNotAvailable.
+
+        The room row is locked for the duration of the check and insert, and
+        the unique (room, date) constraint on RoomNight rejects any insert
+        that still slips through. SQLite lock contention is retried with a
+        short backoff; if the lock is still held after ``retries`` attempts the
+        room counts as unavailable. Other database errors propagate, and so
+        does any error from commit hooks that run once the booking is saved.
+        """
+        booking.room = self
+        for attempt in range(retries + 1):
+            committed = []
+            try:
+                with transaction.atomic():
+                    # Runs ahead of the hooks booking.save() adds; once it has,
+                    # the booking is committed and errors are the hooks' own
+                    transaction.on_commit(lambda: committed.append(True))
+                    Room.objects.select_for_update().only("id").get(pk=self.pk)
+                    if not self.is_available(booking.check_in, booking.check_out):
+                        raise RoomNotAvailable
+                    booking.save()
+                return booking
+            except IntegrityError as exc:
+                if committed:
+                    raise
+                booking.pk = None
+                raise RoomNotAvailable from exc
+            except OperationalError as exc:
+                if committed:
+                    raise
+                booking.pk = None
+                # Anything but lock contention is a real database error
+                if "locked" not in str(exc) and "busy" not in str(exc):
+                    raise
+                if attempt == retries:
+                    raise RoomNotAvailable from exc
+                time.sleep(0.05 * (attempt + 1))
+        raise RoomNotAvailable
+
+
+class RateRule(models.Model):
+    """Seasonal or weekday multiplier on rooms' nightly price.
+
+    Every active rule covering a night applies, so a summer season and a
+    weekend rule compound. bookings.pricing turns them into per-date rates.
+    """
+
+    WEEKDAY_CHOICES = [
+        (0, "Monday"),
+        (1, "Tuesday"),
+        (2, "Wednesday"),
+        (3, "Thursday"),
+        (4, "Friday"),
+        (5, "Saturday"),
+        (6, "Sunday"),
+    ]
 
-    def is_available(self, check_in, check_out):
-        return not self.bookings.filter(
-            models.Q(check_in__lte=check_out) & models.Q(check_out__gte=check_in),
-            status__in=["pending", "confirmed"],
-        ).exists()
+    name = models.CharField(max_length=100, verbose_name=_("Name"))
+    room_type = models.CharField(
+        max_length=10,
+        choices=Room.ROOM_TYPES,
+        blank=True,
+        help_text=_("Leave blank to apply to every room type"),
+        verbose_name=_("Room Type"),
+    )
+    start_date = models.DateField(verbose_name=_("First Night"))
+    end_date = models.DateField(verbose_name=_("Last Night"))
+    weekdays = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text=_("Comma-separated weekday numbers, 0 = Monday; blank for all"),
+        verbose_name=_("Weekdays"),
+    )
+    multiplier = models.DecimalField(
+        max_digits=5,
+        decimal_places=3,
+        default=1,
+        validators=[MinValueValidator(0)],
+        verbose_name=_("Price Multiplier"),
+    )
+    is_active = models.BooleanField(default=True, verbose_name=_("Active"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
+
+    class Meta:
+        verbose_name = _("Rate Rule")
+        verbose_name_plural = _("Rate Calendar")
+        ordering = ["start_date", "name"]
+        indexes = [
+            # RateCalendar.load: active rules overlapping a stay window
+            models.Index(
+                fields=["is_active", "start_date", "end_date"],
+                name="rate_rule_window_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date} – {self.end_date})"
+
+    def clean(self):
+        super().clean()
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError(_("Last night must not be before the first night."))
+        try:
+            days = self.get_weekdays()
+        except ValueError:
+            days = None
+        if days is None or not days <= {day for day, _ in self.WEEKDAY_CHOICES}:
+            raise ValidationError(
+                {"weekdays": _("Use weekday numbers 0-6 separated by commas.")}
+            )
+
+    def get_weekdays(self):
+        """Weekday numbers the rule applies to; empty means every day"""
+        return {int(day) for day in self.weekdays.split(",") if day.strip()}
 
 
 class Booking(models.Model):
@@ -230,6 +640,9 @@ class Booking(models.Model):
         ("completed", "Completed"),
     ]
 
+    # Bookings in these statuses hold their room-nights
+    ACTIVE_STATUSES = ["pending", "confirmed"]
+
     room = models.ForeignKey(
         Room, on_delete=models.CASCADE, related_name="bookings", verbose_name=_("Room")
     )
@@ -272,12 +685,130 @@ class Booking(models.Model):
         verbose_name = _("Reservation")
         verbose_name_plural = _("Reservations")
         ordering = ["-booking_date"]
+        indexes = [
+            # Room.get_booked_ranges: active bookings ending today or later
+            models.Index(
+                fields=["room", "status", "check_out"],
+                name="booking_room_status_out_idx",
+            ),
+            # get_booked_dates ETag: latest change per room
+            models.Index(
+                fields=["room", "updated_at"], name="booking_room_updated_idx"
+            ),
+            # BookingAdmin changelists for admins, team members and guests
+            models.Index(fields=["-booking_date"], name="booking_date_idx"),
+            models.Index(
+                fields=["status", "-booking_date"], name="booking_status_date_idx"
+            ),
+            models.Index(
+                fields=["guest", "-booking_date"], name="booking_guest_date_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Booking {self.id} - {self.room.name} ({self.check_in} to {self.check_out})"
 
+    def clean(self):
+        super().clean()
+        if self.check_in and self.check_out and self.check_out <= self.check_in:
+            raise ValidationError(
+                {"check_out": _("Check-out date must be after check-in date.")}
+            )
+        if (
+            self.room_id
+            and self.check_in
+            and self.check_out
+            and self.status in self.ACTIVE_STATUSES
+            and not self.room.is_available(
+                self.check_in, self.check_out, exclude_booking=self
+            )
+        ):
+            raise ValidationError(_("Room is not available for selected dates."))
+
     def save(self, *args, **kwargs):
         if not self.total_price:
-            nights = (self.check_out - self.check_in).days
-            self.total_price = self.room.price_per_night * nights
-        super().save(*args, **kwargs)
+            from .pricing import quote
+
+            self.total_price = quote(self.room, self.check_in, self.check_out)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.sync_room_nights()
+
+    def get_occupied_dates(self):
+        """Dates held by this booking, check-out day included"""
+        days = (self.check_out - self.check_in).days
+        return [self.check_in + timedelta(days=i) for i in range(days + 1)]
+
+    def sync_room_nights(self):
+        """Rewrite this booking's rows in the room-night inventory"""
+        RoomNight.objects.filter(booking=self).delete()
+        if self.status in self.ACTIVE_STATUSES:
+            RoomNight.objects.bulk_create(
+                RoomNight(room_id=self.room_id, booking=self, date=day)
+                for day in self.get_occupied_dates()
+            )
+
+
+class RoomNight(models.Model):
+    """Denormalized per-room, per-date occupancy kept in sync by Booking.save"""
+
+    room = models.ForeignKey(
+        Room, on_delete=models.CASCADE, related_name="nights", verbose_name=_("Room")
+    )
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        related_name="nights",
+        verbose_name=_("Booking"),
+    )
+    date = models.DateField(verbose_name=_("Date"))
+
+    class Meta:
+        verbose_name = _("Room Night")
+        verbose_name_plural = _("Room Nights")
+        constraints = [
+            models.UniqueConstraint(fields=["room", "date"], name="unique_room_night"),
+        ]
+        indexes = [
+            models.Index(fields=["date", "room"], name="room_night_date_room_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id} @ {self.date}"
+
+
+class DailyStats(models.Model):
+    """Per-date, per-room-type booking totals behind the admin dashboard.
+
+    Kept current by bookings.stats.refresh_daily_stats on every booking
+    change; rebuild_daily_stats recomputes it from scratch.
+    """
+
+    date = models.DateField(verbose_name=_("Date"))
+    room_type = models.CharField(
+        max_length=10, choices=Room.ROOM_TYPES, verbose_name=_("Room Type")
+    )
+    # Nights stayed on this date by active bookings, and their share of the price
+    rooms_sold = models.PositiveIntegerField(default=0, verbose_name=_("Rooms Sold"))
+    room_revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name=_("Room Revenue"),
+    )
+    # Room nights of active bookings made on this date (pickup)
+    nights_booked = models.PositiveIntegerField(
+        default=0, verbose_name=_("Nights Booked")
+    )
+
+    class Meta:
+        verbose_name = _("Daily Stats")
+        verbose_name_plural = _("Daily Stats")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "room_type"], name="unique_daily_stats"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type} @ {self.date}"
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+
+from .models import RateRule, Room
+
+CENT = Decimal("0.01")
+
+
+class RateCalendar:
+    """Nightly price factors per room type over a window of dates.
+
+    Built from the rate rules overlapping the window in one query. For each
+    room type it keeps the running total of the nightly factors, so any stay
+    inside the window costs base price × (total at check-out − total at
+    check-in): one subtraction per room, however long the stay.
+    """
+
+    def __init__(self, start, end, rules):
+        # Nights start..end - 1; end is the last check-out date covered
+        self.start, self.end = start, end
+        nights = (end - start).days
+        factors = {room_type: [Decimal(1)] * nights for room_type, _ in Room.ROOM_TYPES}
+        for rule in rules:
+            room_types = [rule.room_type] if rule.room_type else list(factors)
+            weekdays = rule.get_weekdays()
+            first = max((rule.start_date - start).days, 0)
+            last = min((rule.end_date - start).days, nights - 1)
+            for i in range(first, last + 1):
+                if weekdays and (start + timedelta(days=i)).weekday() not in weekdays:
+                    continue
+                for room_type in room_types:
+                    factors[room_type][i] *= rule.multiplier
+        self.factors = factors
+        self.totals = {
+            room_type: [Decimal(0), *accumulate(nightly)]
+            for room_type, nightly in factors.items()
+        }
+
+    @classmethod
+    def _rules(cls, start, end):
+        return RateRule.objects.filter(
+            is_active=True, start_date__lt=end, end_date__gte=start
+        )
+
+    @classmethod
+    def load(cls, start, end):
+        return cls(start, end, list(cls._rules(start, end)))
+
+    @classmethod
+    async def aload(cls, start, end):
+        return cls(start, end, [rule async for rule in cls._rules(start, end)])
+
+    def _offsets(self, check_in, check_out):
+        if not self.start <= check_in < check_out <= self.end:
+            raise ValueError(f"{check_in}..{check_out} is outside the calendar")
+        return (check_in - self.start).days, (check_out - self.start).days
+
+    def price(self, room, check_in, check_out):
+        """Total price of a stay"""
+        first, last = self._offsets(check_in, check_out)
+        totals = self.totals[room.room_type]
+        return (room.price_per_night * (totals[last] - totals[first])).quantize(CENT)
+
+    def price_rooms(self, rooms, check_in, check_out):
+        """Total price of the same stay in each room, by room id"""
+        return {room.pk: self.price(room, check_in, check_out) for room in rooms}
+
+
+def quote(room, check_in, check_out):
+    """Total price of one stay, from the rate calendar"""
+    if check_out <= check_in:
+        raise ValidationError(_("Check-out date must be after check-in date."))
+    return RateCalendar.load(check_in, check_out).price(room, check_in, check_out)
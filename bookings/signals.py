@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import invalidate_room_search
+from .models import Booking, Room
+from .stats import refresh_for_booking
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_dates(sender, instance, **kwargs):
+    # A moved booking frees its old dates, so those searches expire too
+    instance._previous_dates = (
+        Booking.objects.filter(pk=instance.pk)
+        .values_list("check_in", "check_out")
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def expire_searches_for_booking(sender, instance, **kwargs):
+    ranges = {(instance.check_in, instance.check_out)}
+    if getattr(instance, "_previous_dates", None):
+        ranges.add(instance._previous_dates)
+
+    def expire():
+        for check_in, check_out in ranges:
+            invalidate_room_search(check_in, check_out)
+
+    transaction.on_commit(expire)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_stats_for_booking(sender, instance, **kwargs):
+    ranges = {(instance.check_in, instance.check_out)}
+    if getattr(instance, "_previous_dates", None):
+        ranges.add(instance._previous_dates)
+    booked_on = timezone.localdate(instance.booking_date)
+
+    def refresh():
+        for check_in, check_out in ranges:
+            refresh_for_booking(check_in, check_out, booked_on)
+
+    # The booking is committed by now; a failed refresh (e.g. "database is
+    # locked") is logged rather than failing the request that saved it, and
+    # rebuild_daily_stats catches up
+    transaction.on_commit(refresh, robust=True)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def expire_searches_for_room(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_room_search)
@@ -0,0 +1,147 @@
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.base import Node
+
+from .metrics import current_view
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ("SELECT", "WITH")
+
+# Execute wrappers sit between the ORM and the database; skip their frames
+INSTRUMENTATION = {
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ("slow_queries.py", "metrics.py", "benchmarks.py")
+}
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Execute wrapper logging queries slower than settings.SLOW_QUERY_MS"""
+    threshold = settings.SLOW_QUERY_MS
+    if threshold is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    ms = (time.perf_counter() - started) * 1000
+    if ms >= threshold:
+        code, template = query_origin()
+        logger.info(
+            json.dumps(
+                {
+                    "time": datetime.now(timezone.utc).isoformat(),
+                    "ms": round(ms, 2),
+                    "view": current_view(),
+                    "code": code,
+                    "template": template,
+                    "sql": sql,
+                    "params": None if many else params,
+                    "plan": (
+                        None if many else explain(context["connection"], sql, params)
+                    ),
+                },
+                default=str,
+            )
+        )
+    return result
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_query)
+
+
+def explain(connection, sql, params):
+    """The database's plan for a read query, one line per step"""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    # A fresh backend cursor: the query's own still holds its results, and
+    # this one skips the execute wrappers
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+        return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+    except DatabaseError as exc:
+        return f"EXPLAIN failed: {exc}"
+    finally:
+        cursor.close()
+
+
+def query_origin():
+    """("file:line in function", "template:line") that issued the query.
+
+    The code is the innermost project frame outside the wrappers; the
+    template is the innermost node being rendered. Either may be None, e.g.
+    for async views, whose ORM calls run in an executor thread.
+    """
+    project = str(settings.BASE_DIR) + os.sep
+    code = template = None
+    frame = sys._getframe(1)
+    while frame is not None and (code is None or template is None):
+        if template is None:
+            node = frame.f_locals.get("self")
+            if isinstance(node, Node) and getattr(node, "token", None):
+                origin = node.origin.template_name or node.origin.name
+                template = f"{origin}:{node.token.lineno}"
+        filename = frame.f_code.co_filename
+        if (
+            code is None
+            and filename.startswith(project)
+            and filename not in INSTRUMENTATION
+            and "site-packages" not in filename
+        ):
+            code = (
+                f"{os.path.relpath(filename, project)}:{frame.f_lineno} "
+                f"in {frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+    return code, template
+
+
+def log_files():
+    """The slow query log and its rotated backups"""
+    path = str(settings.SLOW_QUERY_LOG)
+    return glob.glob(glob.escape(path)) + glob.glob(glob.escape(path) + ".*")
+
+
+def top_offenders(limit=50):
+    """Logged statements grouped by SQL, by total time spent, largest first.
+
+    The ORM leaves parameters out of the SQL, so one statement groups every
+    run of the same query shape. Each group keeps its slowest entry.
+    """
+    groups = {}
+    for name in log_files():
+        with open(name, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                group = groups.setdefault(
+                    entry["sql"],
+                    {"sql": entry["sql"], "count": 0, "total_ms": 0, "views": set()},
+                )
+                group["count"] += 1
+                group["total_ms"] += entry["ms"]
+                if entry.get("view"):
+                    group["views"].add(entry["view"])
+                if entry["ms"] > group.get("slowest", {}).get("ms", -1):
+                    group["slowest"] = entry
+
+    offenders = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+    for group in offenders[:limit]:
+        group["total_ms"] = round(group["total_ms"], 1)
+        group["mean_ms"] = round(group["total_ms"] / group["count"], 1)
+        group["views"] = sorted(group["views"])
+    return offenders[:limit]
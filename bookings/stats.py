@@ -0,0 +1,221 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Booking, DailyStats, Room
+
+CENT = Decimal("0.01")
+
+
+def _days(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def refresh_daily_stats(start, end):
+    """Recompute the DailyStats rows for dates start..end (inclusive).
+
+    Reads only the bookings staying or made in that window, so a booking
+    change refreshes just its own dates.
+    """
+    rows = defaultdict(lambda: {"rooms_sold": 0, "room_revenue": 0, "nights_booked": 0})
+    # Stays without nights sell nothing; older rows may predate the rule
+    # that check-out comes after check-in
+    active = Booking.objects.filter(
+        status__in=Booking.ACTIVE_STATUSES, check_out__gt=F("check_in")
+    )
+
+    stays = active.filter(check_in__lte=end, check_out__gt=start).values_list(
+        "room__room_type", "check_in", "check_out", "total_price"
+    )
+    for room_type, check_in, check_out, total_price in stays:
+        nightly = total_price / (check_out - check_in).days
+        for day in _days(max(check_in, start), min(check_out - timedelta(days=1), end)):
+            row = rows[day, room_type]
+            row["rooms_sold"] += 1
+            row["room_revenue"] += nightly
+
+    # A datetime range, unlike __date, can use booking_status_date_idx
+    tz = timezone.get_current_timezone()
+    made = active.filter(
+        booking_date__gte=datetime.combine(start, time(), tzinfo=tz),
+        booking_date__lt=datetime.combine(end + timedelta(days=1), time(), tzinfo=tz),
+    ).values_list("room__room_type", TruncDate("booking_date"), "check_in", "check_out")
+    for room_type, day, check_in, check_out in made:
+        rows[day, room_type]["nights_booked"] += (check_out - check_in).days
+
+    with transaction.atomic():
+        DailyStats.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyStats.objects.bulk_create(
+            DailyStats(
+                date=day,
+                room_type=room_type,
+                rooms_sold=row["rooms_sold"],
+                room_revenue=Decimal(row["room_revenue"]).quantize(CENT),
+                nights_booked=row["nights_booked"],
+            )
+            for (day, room_type), row in rows.items()
+        )
+
+
+def refresh_for_booking(check_in, check_out, booked_on):
+    """Refresh the dates a booking stays on and the day it was made"""
+    refresh_daily_stats(check_in, check_out - timedelta(days=1))
+    if not check_in <= booked_on < check_out:
+        refresh_daily_stats(booked_on, booked_on)
+
+
+def rebuild_daily_stats(chunk_days=92):
+    """Recompute every DailyStats row from the bookings table"""
+    bounds = Booking.objects.aggregate(
+        first_stay=Min("check_in"),
+        last_stay=Max("check_out"),
+        first_made=Min("booking_date"),
+        last_made=Max("booking_date"),
+    )
+    if bounds["first_stay"] is None:
+        DailyStats.objects.all().delete()
+        return 0
+    start = min(bounds["first_stay"], timezone.localdate(bounds["first_made"]))
+    end = max(bounds["last_stay"], timezone.localdate(bounds["last_made"]))
+    DailyStats.objects.filter(date__lt=start).delete()
+    DailyStats.objects.filter(date__gt=end).delete()
+    day = start
+    while day <= end:
+        last = min(day + timedelta(days=chunk_days - 1), end)
+        refresh_daily_stats(day, last)
+        day = last + timedelta(days=1)
+    return DailyStats.objects.count()
+
+
+def _kpis(sold, revenue, room_nights):
+    return {
+        "occupancy": f"{sold / room_nights:.0%}" if room_nights else "-",
+        "adr": f"{revenue / sold:,.2f}" if sold else "-",
+        "revpar": f"{revenue / room_nights:,.2f}" if room_nights else "-",
+    }
+
+
+def dashboard_callback(request, context):
+    """Occupancy, ADR, RevPAR and pickup for the admin index, from DailyStats.
+
+    ``?from=YYYY-MM-DD&days=N`` picks the stay window (default: the next 30
+    days); pickup covers the 7 days up to today.
+    """
+    today = timezone.localdate()
+    days = request.GET.get("days", "")
+    days = min(max(int(days), 1), 366) if days.isdigit() else 30
+    try:
+        start = parse_date(request.GET.get("from", "")) or today
+        end = start + timedelta(days=days - 1)
+    except (ValueError, OverflowError):
+        # Well-formed but impossible, e.g. 2024-02-30, or too close to 9999
+        start = today
+        end = start + timedelta(days=days - 1)
+    pickup_start = today - timedelta(days=6)
+
+    rooms = dict(
+        Room.objects.filter(is_active=True)
+        .values("room_type")
+        .annotate(count=Count("id"))
+        .values_list("room_type", "count")
+    )
+    by_type = {
+        row["room_type"]: row
+        for row in DailyStats.objects.filter(date__gte=start, date__lte=end)
+        .values("room_type")
+        .annotate(sold=Sum("rooms_sold"), revenue=Sum("room_revenue"))
+    }
+    pickup = dict(
+        DailyStats.objects.filter(date__gte=pickup_start, date__lte=today)
+        .values("room_type")
+        .annotate(nights=Sum("nights_booked"))
+        .values_list("room_type", "nights")
+    )
+    by_date = {
+        row["date"]: row
+        for row in DailyStats.objects.filter(date__gte=start, date__lte=end)
+        .values("date")
+        .annotate(
+            sold=Sum("rooms_sold"),
+            revenue=Sum("room_revenue"),
+            booked=Sum("nights_booked"),
+        )
+    }
+
+    type_rows, total_sold, total_revenue = [], 0, Decimal(0)
+    for room_type, label in Room.ROOM_TYPES:
+        stats = by_type.get(room_type, {})
+        sold, revenue = stats.get("sold", 0), stats.get("revenue") or Decimal(0)
+        kpis = _kpis(sold, revenue, rooms.get(room_type, 0) * days)
+        type_rows.append(
+            [
+                label,
+                rooms.get(room_type, 0),
+                sold,
+                kpis["occupancy"],
+                kpis["adr"],
+                kpis["revpar"],
+                pickup.get(room_type, 0),
+            ]
+        )
+        total_sold += sold
+        total_revenue += revenue
+
+    total_rooms = sum(rooms.values())
+    date_rows = []
+    for day in _days(start, end):
+        stats = by_date.get(day, {})
+        sold, revenue = stats.get("sold", 0), stats.get("revenue") or Decimal(0)
+        kpis = _kpis(sold, revenue, total_rooms)
+        date_rows.append(
+            [
+                day,
+                sold,
+                kpis["occupancy"],
+                kpis["adr"],
+                kpis["revpar"],
+                stats.get("booked", 0),
+            ]
+        )
+
+    context.update(
+        {
+            "stats_start": start,
+            "stats_end": end,
+            "stats_kpis": {
+                **_kpis(total_sold, total_revenue, total_rooms * days),
+                "revenue": f"{total_revenue:,.2f}",
+                "pickup": sum(pickup.values()),
+            },
+            "stats_by_type": {
+                "headers": [
+                    "Room type",
+                    "Rooms",
+                    "Nights sold",
+                    "Occupancy",
+                    "ADR",
+                    "RevPAR",
+                    "Pickup (7 days)",
+                ],
+                "rows": type_rows,
+            },
+            "stats_by_date": {
+                "headers": [
+                    "Date",
+                    "Nights sold",
+                    "Occupancy",
+                    "ADR",
+                    "RevPAR",
+                    "Nights booked that day",
+                ],
+                "rows": date_rows,
+            },
+        }
+    )
+    return context
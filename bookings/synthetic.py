@@ -0,0 +1,242 @@
+import math
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import invalidate_room_search
+from .models import Booking, CustomUser, Room, RoomNight
+from .pricing import RateCalendar
+
+# room type: (adults, children, base nightly price, bed types)
+ROOM_PROFILES = {
+    "single": (1, 0, 80, ["single", "double"]),
+    "double": (2, 1, 120, ["double", "queen"]),
+    "suite": (3, 2, 260, ["king", "queen"]),
+    "family": (4, 3, 180, ["double", "queen", "king"]),
+}
+
+ROOMS_PER_FLOOR = 40
+
+# Nights per stay and how often each occurs
+STAY_NIGHTS = [1, 2, 3, 4, 5, 6, 7, 10, 14]
+STAY_WEIGHTS = [18, 24, 18, 12, 8, 5, 9, 4, 2]
+MEAN_NIGHTS = sum(n * w for n, w in zip(STAY_NIGHTS, STAY_WEIGHTS)) / sum(STAY_WEIGHTS)
+
+FIRST_NAMES = ["Alex", "Sam", "Maria", "Jon", "Aiko", "Lena", "Omar", "Priya"]
+LAST_NAMES = ["Smith", "Garcia", "Kim", "Novak", "Okafor", "Rossi", "Sato", "Weber"]
+
+
+def demand(day):
+    """Relative demand for a date: a mid-July peak, the holidays and weekends"""
+    level = 1 + 0.35 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 196) / 365)
+    if day.month == 12 and day.day >= 20:
+        level += 0.3
+    if day.weekday() in (4, 5):
+        level *= 1.15
+    return level
+
+
+@contextmanager
+def explicit_timestamps(model, *names):
+    """Let bulk_create write the given auto_now(_add) fields as set on objects.
+
+    Not thread-safe: meant for one-off management commands only.
+    """
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def create_rooms(count, rng, batch_size):
+    """Rooms cycling through every room type and its bed types"""
+    offset = Room.objects.count()
+    room_types = [room_type for room_type, _ in Room.ROOM_TYPES]
+    rooms = []
+    for i in range(offset, offset + count):
+        room_type = room_types[i % len(room_types)]
+        adults, children, price, beds = ROOM_PROFILES[room_type]
+        floor, number = divmod(i, ROOMS_PER_FLOOR)
+        room_number = f"{floor + 1}{number + 1:02d}"
+        label = dict(Room.ROOM_TYPES)[room_type]
+        premium = room_type in ("suite", "family")
+        rooms.append(
+            Room(
+                name=f"{label} {room_number}",
+                room_type=room_type,
+                room_number=room_number,
+                floor=floor + 1,
+                bed_type=beds[(i // len(room_types)) % len(beds)],
+                capacity_adults=adults,
+                capacity_children=children,
+                price_per_night=Decimal(price + 10 * rng.randint(-2, 4) + floor),
+                extra_beds_available=rng.randint(0, 2) if premium else 0,
+                has_bathtub=premium or rng.random() < 0.3,
+                has_minibar=premium,
+                has_safe=room_type != "single",
+                has_coffee_maker=premium or rng.random() < 0.5,
+                has_balcony=floor >= 2 and rng.random() < 0.4,
+                room_view=rng.choice(["City", "Garden", "Sea", ""]),
+                description=f"{label} room on floor {floor + 1}.",
+            )
+        )
+    return Room.objects.bulk_create(rooms, batch_size=batch_size)
+
+
+def create_guests(count, rng, batch_size):
+    offset = CustomUser.objects.count()
+    CustomUser.objects.bulk_create(
+        (
+            CustomUser(
+                username=f"guest{i}",
+                email=f"guest{i}@example.com",
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                # Unusable: generated guests cannot log in
+                password="!",
+            )
+            for i in range(offset, offset + count)
+        ),
+        batch_size=batch_size,
+    )
+    return list(
+        CustomUser.objects.filter(role=CustomUser.CUSTOMER).values_list("id", flat=True)
+    )
+
+
+def room_stays(rng, first, last, occupancy, limit=None):
+    """(check_in, check_out) of one room's stays between first and last.
+
+    Walks back from ``last`` so the newest history is always filled. Gaps
+    shrink as demand rises; the day after a check-out is the earliest
+    next check-in, as the check-out day is held in the inventory.
+    """
+    mean_gap = max(MEAN_NIGHTS / occupancy - MEAN_NIGHTS - 1, 0.1)
+    stays, cursor = [], last
+    while limit is None or len(stays) < limit:
+        check_out = cursor - timedelta(
+            days=int(rng.expovariate(demand(cursor) / mean_gap))
+        )
+        nights = rng.choices(STAY_NIGHTS, STAY_WEIGHTS)[0]
+        check_in = check_out - timedelta(days=nights)
+        if check_in < first:
+            break
+        stays.append((check_in, check_out))
+        cursor = check_in - timedelta(days=1)
+    return stays
+
+
+def booking_status(rng, check_in, check_out, today):
+    if check_out < today:
+        return "cancelled" if rng.random() < 0.12 else "completed"
+    if rng.random() < 0.08:
+        return "cancelled"
+    # Most near-term stays are confirmed; later ones are often still pending
+    confirmed = 0.9 if check_in <= today + timedelta(days=30) else 0.6
+    return "confirmed" if rng.random() < confirmed else "pending"
+
+
+def generate(
+    rooms,
+    guests,
+    years=3,
+    future_days=180,
+    occupancy=0.7,
+    bookings=None,
+    batch_size=10_000,
+    random_seed=0,
+):
+    """Fill the database with rooms, guests and booking history.
+
+    Each room gets non-overlapping stays over ``years`` of history and
+    ``future_days`` ahead, or, with ``bookings``, an even share of that
+    many (going back as far as needed). Prices come from one rate calendar
+    over the whole window instead of Booking.save. Rows are written with
+    bulk_create, one transaction per batch, and active stays get their
+    room-nights. Returns the row counts written.
+    """
+    rng = random.Random(random_seed)
+    today = timezone.localdate()
+    now = timezone.now()
+    tz = timezone.get_current_timezone()
+
+    room_objects = create_rooms(rooms, rng, batch_size)
+    guest_ids = create_guests(guests, rng, batch_size)
+    written = {"rooms": rooms, "guests": guests, "bookings": 0, "room_nights": 0}
+    if not room_objects or not guest_ids:
+        return written
+
+    per_room, extra = divmod(bookings, rooms) if bookings is not None else (None, 0)
+    if per_room is not None:
+        # Enough history for the share at the target occupancy, with margin
+        cycle = MEAN_NIGHTS / occupancy
+        years = max(years, math.ceil((per_room + 1) * cycle * 1.5 / 365))
+    first = today - timedelta(days=365 * years)
+    last = today + timedelta(days=future_days)
+    calendar = RateCalendar.load(first, last + timedelta(days=1))
+
+    def write(batch):
+        with transaction.atomic(), explicit_timestamps(
+            Booking, "booking_date", "updated_at"
+        ):
+            Booking.objects.bulk_create(batch)
+            nights = RoomNight.objects.bulk_create(
+                (
+                    RoomNight(room_id=booking.room_id, booking_id=booking.pk, date=day)
+                    for booking in batch
+                    if booking.status in Booking.ACTIVE_STATUSES
+                    for day in booking.get_occupied_dates()
+                ),
+                batch_size=batch_size,
+            )
+        written["bookings"] += len(batch)
+        written["room_nights"] += len(nights)
+
+    batch = []
+    for index, room in enumerate(room_objects):
+        limit = None if per_room is None else per_room + (index < extra)
+        for check_in, check_out in room_stays(rng, first, last, occupancy, limit):
+            lead = timedelta(
+                days=min(int(rng.expovariate(1 / 35)), 365),
+                seconds=rng.randrange(86400),
+            )
+            booked = datetime.combine(check_in, time(), tzinfo=tz) - lead
+            if booked > now:
+                # Not due yet at that lead time: booked within the last month
+                booked = now - timedelta(seconds=rng.randrange(30 * 86400))
+            batch.append(
+                Booking(
+                    room_id=room.id,
+                    guest_id=rng.choice(guest_ids),
+                    check_in=check_in,
+                    check_out=check_out,
+                    num_adults=rng.randint(1, room.capacity_adults),
+                    num_children=(
+                        rng.randint(0, room.capacity_children)
+                        if rng.random() < 0.3
+                        else 0
+                    ),
+                    total_price=calendar.price(room, check_in, check_out),
+                    status=booking_status(rng, check_in, check_out, today),
+                    booking_date=booked,
+                    updated_at=booked,
+                )
+            )
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+    if batch:
+        write(batch)
+
+    # bulk_create skips the signals that expire cached searches
+    transaction.on_commit(invalidate_room_search)
+    return written
@@ -1,3 +1,1276 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from PIL import Image
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .benchmarks import Scenario, compare, run_scenario
+from .exports import iter_bookings_csv
+from .imports import import_gallery
+from .management.commands.process_images import Command as ProcessImagesCommand
+from .metrics import registry
+from .models import (
+    Booking,
+    CustomUser,
+    DailyStats,
+    GalleryImage,
+    RateRule,
+    Room,
+    RoomNight,
+    RoomNotAvailable,
+)
+from .pricing import RateCalendar, quote
+from .slow_queries import top_offenders
+from .stats import rebuild_daily_stats
+from .synthetic import generate
+
+
+def create_room(number="101", **kwargs):
+    defaults = {
+        "name": f"Room {number}",
+        "room_type": "double",
+        "room_number": number,
+        "floor": 1,
+        "capacity_adults": 2,
+        "capacity_children": 1,
+        "price_per_night": 100,
+        "description": "A quiet room with a view.",
+    }
+    defaults.update(kwargs)
+    return Room.objects.create(**defaults)
+
+
+class RoomNightInventoryTests(TestCase):
+    def setUp(self):
+        self.room = create_room("101")
+        self.other = create_room("102")
+        self.guest = CustomUser.objects.create(username="guest")
+        self.check_in = timezone.localdate() + timedelta(days=5)
+
+    def book(self, room, check_in, nights, **kwargs):
+        return Booking.objects.create(
+            room=room,
+            guest=self.guest,
+            check_in=check_in,
+            check_out=check_in + timedelta(days=nights),
+            num_adults=1,
+            **kwargs,
+        )
+
+    def nights(self):
+        return set(RoomNight.objects.values_list("room_id", "booking_id", "date"))
+
+    def held(self, booking):
+        return {
+            (booking.room_id, booking.pk, day) for day in booking.get_occupied_dates()
+        }
+
+    def test_nights_follow_booking_dates_room_and_status(self):
+        booking = self.book(self.room, self.check_in, 2)
+        # The check-out day is held too
+        self.assertEqual(len(self.held(booking)), 3)
+        self.assertEqual(self.nights(), self.held(booking))
+
+        booking.check_in += timedelta(days=10)
+        booking.check_out += timedelta(days=11)
+        booking.save()
+        self.assertEqual(self.nights(), self.held(booking))
+        self.assertFalse(self.room.is_available(booking.check_in, booking.check_out))
+        # The old dates are free again
+        self.assertTrue(
+            self.room.is_available(self.check_in, self.check_in + timedelta(days=2))
+        )
+
+        booking.room = self.other
+        booking.save()
+        self.assertEqual(self.nights(), self.held(booking))
+        self.assertFalse(self.room.nights.exists())
+
+        for status in ("cancelled", "confirmed", "completed"):
+            booking.status = status
+            booking.save()
+            expected = self.held(booking) if status == "confirmed" else set()
+            self.assertEqual(self.nights(), expected)
+
+    def test_rebuild_command_restores_inventory_of_active_bookings(self):
+        active = [
+            self.book(self.room, self.check_in, 3),
+            self.book(self.other, self.check_in, 1, status="confirmed"),
+            self.book(self.room, self.check_in + timedelta(days=10), 2),
+        ]
+        self.book(self.other, self.check_in + timedelta(days=10), 2, status="cancelled")
+        expected = set().union(*map(self.held, active))
+        # Lose some rows and gain a stray one
+        RoomNight.objects.filter(booking=active[0]).delete()
+        RoomNight.objects.create(
+            room=self.other, booking=active[1], date=self.check_in + timedelta(days=30)
+        )
+
+        out = io.StringIO()
+        call_command("rebuild_room_nights", batch_size=2, stdout=out)
+
+        self.assertEqual(self.nights(), expected)
+        self.assertIn(f"Rebuilt {len(expected)} room-nights", out.getvalue())
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    def test_parallel_reservations_for_one_room_have_one_winner(self):
+        room = create_room()
+        guests = [CustomUser.objects.create(username=f"guest{i}") for i in range(10)]
+        check_in = timezone.now().date() + timedelta(days=7)
+        check_out = check_in + timedelta(days=3)
+        start = threading.Barrier(len(guests))
+        results = []
+
+        def attempt(guest):
+            try:
+                # Each thread loads the room on its own connection
+                target = Room.objects.get(pk=room.pk)
+                start.wait()
+                booking = Booking(
+                    guest=guest,
+                    check_in=check_in,
+                    check_out=check_out,
+                    num_adults=1,
+                )
+                try:
+                    target.reserve(booking)
+                except RoomNotAvailable:
+                    results.append(False)
+                else:
+                    results.append(True)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(g,)) for g in guests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), len(guests))
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(Booking.objects.filter(room=room).count(), 1)
+        self.assertEqual(room.nights.count(), 4)
+
+    def test_commit_hook_errors_do_not_undo_a_reservation(self):
+        room = create_room()
+        guest = CustomUser.objects.create(username="guest")
+        check_in = timezone.now().date() + timedelta(days=7)
+
+        def booking(days):
+            return Booking(
+                guest=guest,
+                check_in=check_in + timedelta(days=days),
+                check_out=check_in + timedelta(days=days + 2),
+                num_adults=1,
+            )
+
+        locked = OperationalError("database is locked")
+        with patch("bookings.signals.refresh_for_booking", side_effect=locked):
+            with self.assertLogs("django.db.backends.base", "ERROR"):
+                saved = room.reserve(booking(0))
+        self.assertTrue(Booking.objects.filter(pk=saved.pk).exists())
+
+        # Hooks that are not robust still raise, but never as "unavailable"
+        with patch("bookings.signals.invalidate_room_search", side_effect=locked):
+            with self.assertRaisesMessage(OperationalError, "database is locked"):
+                room.reserve(booking(5))
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_only_lock_contention_reads_as_unavailable(self):
+        room = create_room()
+        booking = Booking(
+            guest=CustomUser.objects.create(username="guest"),
+            check_in=timezone.now().date() + timedelta(days=7),
+            check_out=timezone.now().date() + timedelta(days=9),
+            num_adults=1,
+        )
+        with patch("bookings.models.time.sleep"), patch.object(
+            Booking, "save", side_effect=OperationalError("database is locked")
+        ) as save:
+            with self.assertRaises(RoomNotAvailable):
+                room.reserve(booking, retries=2)
+        self.assertEqual(save.call_count, 3)
+
+        with patch.object(
+            Booking, "save", side_effect=OperationalError("disk I/O error")
+        ) as save:
+            with self.assertRaisesMessage(OperationalError, "disk I/O error"):
+                room.reserve(booking)
+        self.assertEqual(save.call_count, 1)
+
+
+class BookedDatesTests(TestCase):
+    def setUp(self):
+        self.room = create_room()
+        guest = CustomUser.objects.create(username="guest")
+        today = timezone.now().date()
+        for start, end in [(1, 3), (4, 5), (10, 12)]:
+            Booking.objects.create(
+                room=self.room,
+                guest=guest,
+                check_in=today + timedelta(days=start),
+                check_out=today + timedelta(days=end),
+                num_adults=1,
+            )
+        self.url = reverse("get_booked_dates", args=[self.room.id])
+
+    def test_adjacent_bookings_are_merged_into_ranges(self):
+        ranges = self.client.get(self.url).json()["booked_ranges"]
+        today = timezone.now().date()
+        self.assertEqual(
+            ranges,
+            [
+                [str(today + timedelta(days=1)), str(today + timedelta(days=5))],
+                [str(today + timedelta(days=10)), str(today + timedelta(days=12))],
+            ],
+        )
+
+    def test_flat_flag_returns_one_entry_per_date(self):
+        dates = self.client.get(self.url, {"flat": 1}).json()["booked_dates"]
+        self.assertEqual(len(dates), 8)
+
+    def test_unchanged_bookings_return_not_modified(self):
+        first = self.client.get(self.url)
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        Booking.objects.filter(room=self.room).first().delete()
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+
+    @override_settings(COMPRESS_ENABLED=False, COMPRESS_PRECOMPILERS=())
+    def test_missing_room_is_never_revalidated(self):
+        room = create_room(number="102")
+        urls = [
+            reverse("get_booked_dates", args=[room.id]),
+            reverse("room_detail", args=[room.id]),
+        ]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+        room.delete()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 404)
+            self.assertNotIn("ETag", response.headers)
+
+
+@override_settings(COMPRESS_ENABLED=False, COMPRESS_PRECOMPILERS=())
+class ImageQueryCountTests(TestCase):
+    def create_rooms(self, count):
+        for i in range(count):
+            room = create_room(number=f"{Room.objects.count() + 1}")
+            for order in range(3):
+                GalleryImage.objects.create(
+                    room=room,
+                    image=f"gallery/{room.room_number}-{order}.jpg",
+                    is_primary=order == 1,
+                    order=order,
+                    processing_status=GalleryImage.READY,
+                )
+
+    def test_room_list_query_count_does_not_grow_with_rooms(self):
+        self.create_rooms(2)
+        with self.assertNumQueries(4):
+            small = self.client.get(reverse("home"), HTTP_HX_REQUEST="true")
+        self.create_rooms(8)
+        with self.assertNumQueries(4):
+            large = self.client.get(reverse("home"), HTTP_HX_REQUEST="true")
+        self.assertContains(small, "gallery/1-1/")
+        self.assertContains(large, "gallery/10-1/")
+
+    def test_room_detail_loads_gallery_in_one_query(self):
+        self.create_rooms(1)
+        room = Room.objects.get()
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("room_detail", args=[room.id]))
+        self.assertContains(response, "gallery/1-2/")
+
+    def test_card_offers_width_renditions_lazily(self):
+        room = create_room()
+        GalleryImage.objects.create(
+            room=room,
+            image="gallery/small.jpg",
+            is_primary=True,
+            processing_status=GalleryImage.READY,
+            image_width=800,
+            image_height=600,
+        )
+        response = self.client.get(reverse("home"), HTTP_HX_REQUEST="true")
+        content = response.content.decode()
+        self.assertIn('loading="lazy"', content)
+        self.assertIn('width="640"', content)
+        self.assertIn('height="480"', content)
+        # An 800px original is never upscaled, so 960w and wider collapse
+        self.assertEqual(content.count(" 320w"), 2)
+        self.assertEqual(content.count(" 800w"), 2)
+        self.assertNotIn(" 960w", content)
+
+    def test_unprocessed_image_shows_placeholder(self):
+        room = create_room()
+        GalleryImage.objects.create(room=room, image="gallery/new.jpg", is_primary=True)
+        response = self.client.get(reverse("home"), HTTP_HX_REQUEST="true")
+        self.assertContains(response, "images/placeholder.svg")
+        self.assertNotContains(response, "gallery/new")
+
+
+class ImageWorkerTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.room = create_room()
+
+    def upload(self, name, color="black", **kwargs):
+        photo = io.BytesIO()
+        Image.new("RGB", (400, 300), color).save(photo, "JPEG")
+        return GalleryImage.objects.create(
+            room=self.room, image=SimpleUploadedFile(name, photo.getvalue()), **kwargs
+        )
+
+    def process(self):
+        call_command("process_images", workers=0, once=True, stdout=io.StringIO())
+
+    def test_pending_image_gets_its_renditions(self):
+        image = self.upload("a.jpg")
+        self.assertEqual(image.processing_status, GalleryImage.PENDING)
+
+        self.process()
+
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, GalleryImage.READY)
+        self.assertIsNotNone(image.processed_at)
+        self.assertEqual((image.image_width, image.image_height), (400, 300))
+        storage = image.image.storage
+        self.assertTrue(storage.exists(image.thumbnail.name))
+
+    def test_stale_processing_image_is_requeued(self):
+        image = self.upload("a.jpg")
+        # Claimed by a worker that died before finishing
+        GalleryImage.objects.filter(pk=image.pk).update(
+            processing_status=GalleryImage.PROCESSING
+        )
+
+        self.process()
+
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, GalleryImage.READY)
+        self.assertIsNotNone(image.processed_at)
+
+    def test_claimed_images_are_not_claimed_again(self):
+        first = self.upload("a.jpg")
+        second = self.upload("b.jpg", color="white")
+        command = ProcessImagesCommand()
+
+        self.assertEqual(
+            command.claim(10),
+            [(first.pk, first.image.name), (second.pk, second.image.name)],
+        )
+        self.assertEqual(command.claim(10), [])
+        self.assertEqual(
+            set(GalleryImage.objects.values_list("processing_status", flat=True)),
+            {GalleryImage.PROCESSING},
+        )
+
+
+@override_settings(COMPRESS_ENABLED=False, COMPRESS_PRECOMPILERS=())
+class RoomSearchCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.room = create_room()
+        self.guest = CustomUser.objects.create(username="guest")
+        self.check_in = timezone.now().date() + timedelta(days=10)
+        self.params = {
+            "check_in": self.check_in,
+            "check_out": self.check_in + timedelta(days=2),
+            "adults": 1,
+            "children": 0,
+        }
+
+    def search(self):
+        return self.client.get(reverse("home"), self.params, HTTP_HX_REQUEST="true")
+
+    def test_repeated_search_skips_availability_query(self):
+        self.search()
+        # ETag: rooms, images, held nights, rates; page: rooms, images, one
+        # rate load
+        with self.assertNumQueries(7):
+            response = self.search()
+        self.assertContains(response, self.room.name)
+
+    def test_search_length_is_capped_and_versions_expire(self):
+        self.params["check_out"] = self.check_in + timedelta(days=366)
+        with patch.object(cache, "set_many", wraps=cache.set_many) as set_many:
+            response = self.search()
+        self.assertFalse(response.context["form"].is_valid())
+        written = [key for call in set_many.mock_calls for key in call.args[0]]
+        self.assertFalse([key for key in written if key.startswith("room_search")])
+
+        # A month of check-in dates plus the stay stretches past a year
+        self.params.update(
+            check_out=self.check_in + timedelta(days=360), flexibility="month"
+        )
+        self.assertFalse(self.search().context["form"].is_valid())
+
+        del self.params["flexibility"]
+        self.params["check_out"] = self.check_in + timedelta(days=2)
+        with patch.object(cache, "set_many", wraps=cache.set_many) as set_many:
+            self.assertContains(self.search(), self.room.name)
+        self.assertNotIn(None, [call.kwargs["timeout"] for call in set_many.mock_calls])
+
+    def test_overlapping_booking_expires_cached_search(self):
+        self.assertContains(self.search(), self.room.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                room=self.room,
+                guest=self.guest,
+                check_in=self.check_in + timedelta(days=2),
+                check_out=self.check_in + timedelta(days=4),
+                num_adults=1,
+            )
+        self.assertNotContains(self.search(), self.room.name)
+
+    def test_booking_outside_range_keeps_cached_search(self):
+        self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                room=self.room,
+                guest=self.guest,
+                check_in=self.check_in + timedelta(days=5),
+                check_out=self.check_in + timedelta(days=6),
+                num_adults=1,
+            )
+        with self.assertNumQueries(7):
+            self.search()
+
+
+@override_settings(COMPRESS_ENABLED=False, COMPRESS_PRECOMPILERS=())
+class RoomCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.room = create_room()
+
+    def test_card_is_rendered_once_until_room_changes(self):
+        url = reverse("home")
+        with patch("bookings.views.render_to_string", wraps=render_to_string) as render:
+            self.client.get(url, HTTP_HX_REQUEST="true")
+            self.client.get(url, HTTP_HX_REQUEST="true")
+            self.assertEqual(render.call_count, 1)
+
+            self.room.name = "Garden Suite"
+            self.room.save()
+            response = self.client.get(url, HTTP_HX_REQUEST="true")
+            self.assertEqual(render.call_count, 2)
+        self.assertContains(response, "Garden Suite")
+
+
+@override_settings(COMPRESS_ENABLED=False, COMPRESS_PRECOMPILERS=())
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.room = create_room()
+        self.url = reverse("room_detail", args=[self.room.id])
+
+    def test_unchanged_room_detail_returns_not_modified(self):
+        # The first response sets the CSRF cookie that later ETags include
+        self.client.get(self.url)
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_booking_changes_room_detail_etag(self):
+        self.client.get(self.url)
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        Booking.objects.create(
+            room=self.room,
+            guest=CustomUser.objects.create(username="guest"),
+            check_in=timezone.now().date() + timedelta(days=3),
+            check_out=timezone.now().date() + timedelta(days=5),
+            num_adults=1,
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_home_search_etag_follows_bookings_from_other_processes(self):
+        url = reverse("home")
+        check_in = timezone.localdate() + timedelta(days=3)
+        search = {
+            "check_in": check_in,
+            "check_out": check_in + timedelta(days=2),
+            "adults": 1,
+        }
+        self.client.get(url, search, HTTP_HX_REQUEST="true")
+        etag = self.client.get(url, search, HTTP_HX_REQUEST="true")["ETag"]
+        # TestCase never runs on_commit hooks, so this process's cached search
+        # versions are not bumped, as for a booking made by another worker
+        Booking.objects.create(
+            room=self.room,
+            guest=CustomUser.objects.create(username="guest"),
+            check_in=check_in + timedelta(days=1),
+            check_out=check_in + timedelta(days=4),
+            num_adults=1,
+        )
+        response = self.client.get(
+            url, search, HTTP_HX_REQUEST="true", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_home_etag_differs_for_htmx_partial(self):
+        url = reverse("home")
+        full = self.client.get(url)
+        partial = self.client.get(
+            url, HTTP_HX_REQUEST="true", HTTP_IF_NONE_MATCH=full["ETag"]
+        )
+        self.assertEqual(partial.status_code, 200)
+        again = self.client.get(
+            url, HTTP_HX_REQUEST="true", HTTP_IF_NONE_MATCH=partial["ETag"]
+        )
+        self.assertEqual(again.status_code, 304)
+
+
+class BookingExportTests(TestCase):
+    def test_admin_action_streams_filtered_changelist(self):
+        admin_user = CustomUser.objects.create_superuser("admin", "a@example.com", "pw")
+        room = create_room()
+        check_in = timezone.now().date() + timedelta(days=1)
+        for status in ("pending", "cancelled"):
+            Booking.objects.create(
+                room=room,
+                guest=admin_user,
+                check_in=check_in,
+                check_out=check_in + timedelta(days=2),
+                num_adults=1,
+                status=status,
+            )
+            check_in += timedelta(days=5)
+        self.client.force_login(admin_user)
+
+        response = self.client.post(
+            reverse("admin:bookings_booking_changelist") + "?status__exact=pending",
+            {
+                "action": "export_csv",
+                "index": 0,
+                "select_across": 1,
+                "_selected_action": [Booking.objects.first().pk],
+            },
+        )
+
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:2], ["Booking ID", "Status"])
+        self.assertEqual(len(lines), 2)
+        self.assertIn("pending", lines[1])
+
+    def test_guest_text_cannot_run_as_a_formula(self):
+        guest = CustomUser.objects.create(
+            username="guest",
+            email="@SUM(1)@example.com",
+            first_name='=HYPERLINK("http://example.com")',
+            last_name="Smith",
+        )
+        check_in = timezone.now().date() + timedelta(days=1)
+        Booking.objects.create(
+            room=create_room(),
+            guest=guest,
+            check_in=check_in,
+            check_out=check_in + timedelta(days=2),
+            num_adults=1,
+            special_requests="-2+3",
+        )
+
+        row = next(csv.DictReader(iter_bookings_csv(Booking.objects.all())))
+        self.assertEqual(row["Guest First Name"], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row["Guest Email"], "'@SUM(1)@example.com")
+        self.assertEqual(row["Special Requests"], "'-2+3")
+        self.assertEqual(row["Guest Last Name"], "Smith")
+
+
+class GalleryImportTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.first = create_room("101")
+        self.second = create_room("102")
+        GalleryImage.objects.create(
+            room=self.second, image="gallery/old.jpg", is_primary=True, order=4
+        )
+
+    def archive(self):
+        buffer = io.BytesIO()
+        image = io.BytesIO()
+        Image.new("RGB", (40, 30)).save(image, "JPEG")
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("manifest.csv", "file,room,order,primary\nlobby.jpg,102,,yes\n")
+            zf.writestr("lobby.jpg", image.getvalue())
+            zf.writestr("101/bed.jpg", image.getvalue())
+            zf.writestr("loose.jpg", image.getvalue())
+            zf.writestr("broken.jpg", b"not an image")
+            zf.writestr("__MACOSX/._bed.jpg", b"")
+        return SimpleUploadedFile("photos.zip", buffer.getvalue())
+
+    def test_admin_action_imports_archive_into_rooms(self):
+        admin_user = CustomUser.objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin_user)
+
+        self.client.post(
+            reverse("admin:bookings_room_changelist"),
+            {
+                "action": "import_gallery",
+                "apply": "yes",
+                "_selected_action": [self.first.pk],
+                "archive": self.archive(),
+            },
+        )
+
+        # loose.jpg falls back to the only selected room; 102 is not selected
+        self.assertEqual(self.first.images.count(), 2)
+        self.assertEqual(self.second.images.count(), 1)
+
+    def test_manifest_sets_room_order_and_primary(self):
+        result = import_gallery(self.archive(), default_room=self.first)
+
+        self.assertEqual(result.created, 3)
+        self.assertEqual([name for name, _ in result.skipped], ["broken.jpg"])
+        lobby = GalleryImage.objects.get(title="lobby")
+        self.assertEqual((lobby.room, lobby.order), (self.second, 5))
+        self.assertEqual(list(self.second.images.filter(is_primary=True)), [lobby])
+        self.assertTrue(
+            all(
+                image.processing_status == "pending"
+                for image in self.first.images.all()
+            )
+        )
+
+
+class GalleryDeduplicationTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.room = create_room()
+        image = io.BytesIO()
+        Image.new("RGB", (40, 30)).save(image, "JPEG")
+        self.photo = image.getvalue()
+
+    def test_identical_uploads_share_original_and_renditions(self):
+        first = GalleryImage.objects.create(
+            room=self.room, image=SimpleUploadedFile("a.jpg", self.photo)
+        )
+        GalleryImage.objects.filter(pk=first.pk).update(
+            processing_status=GalleryImage.READY, image_width=40, image_height=30
+        )
+
+        second = GalleryImage.objects.create(
+            room=self.room, image=SimpleUploadedFile("b.jpg", self.photo)
+        )
+
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.content_hash, first.content_hash)
+        self.assertEqual(second.processing_status, GalleryImage.READY)
+        self.assertEqual(second.image_width, 40)
+
+    def test_command_collapses_existing_duplicates(self):
+        storage = GalleryImage._meta.get_field("image").storage
+        for name in ("gallery/a.jpg", "gallery/b.jpg", "gallery/thumbnails/a.jpg"):
+            storage.save(name, ContentFile(self.photo))
+        for name in ("gallery/a.jpg", "gallery/b.jpg"):
+            GalleryImage.objects.create(
+                room=self.room, image=name, processing_status=GalleryImage.READY
+            )
+
+        call_command("dedupe_gallery", stdout=io.StringIO())
+
+        names = set(GalleryImage.objects.values_list("image", flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(storage.exists(names.pop()))
+        self.assertFalse(storage.exists("gallery/a.jpg"))
+        self.assertFalse(storage.exists("gallery/thumbnails/a.jpg"))
+        self.assertFalse(
+            GalleryImage.objects.exclude(processing_status="pending").exists()
+        )
+
+
+class RateCalendarTests(TestCase):
+    def setUp(self):
+        # A Friday, so the stay covers Friday and Saturday nights
+        self.check_in = timezone.localdate() + timedelta(days=30)
+        self.check_in += timedelta(days=(4 - self.check_in.weekday()) % 7)
+        self.check_out = self.check_in + timedelta(days=3)
+        self.double = create_room("101", price_per_night=100)
+        self.suite = create_room("102", room_type="suite", price_per_night=200)
+        RateRule.objects.create(
+            name="Season",
+            start_date=self.check_in,
+            end_date=self.check_out,
+            multiplier="1.5",
+        )
+        RateRule.objects.create(
+            name="Suite weekends",
+            room_type="suite",
+            start_date=self.check_in,
+            end_date=self.check_out,
+            weekdays="4,5",
+            multiplier="2",
+        )
+
+    def test_rules_compound_per_night_and_room_type(self):
+        calendar = RateCalendar.load(self.check_in, self.check_out)
+        self.assertEqual(
+            calendar.price_rooms(
+                [self.double, self.suite], self.check_in, self.check_out
+            ),
+            {self.double.pk: Decimal("450.00"), self.suite.pk: Decimal("1500.00")},
+        )
+        booking = Booking.objects.create(
+            room=self.suite,
+            guest=CustomUser.objects.create(username="guest"),
+            check_in=self.check_in,
+            check_out=self.check_out,
+            num_adults=1,
+        )
+        self.assertEqual(booking.total_price, Decimal("1500.00"))
+
+    def test_quote_endpoint_prices_the_stay(self):
+        response = self.client.get(
+            reverse("get_quote", args=[self.double.id]),
+            {"check_in": self.check_in, "check_out": self.check_out},
+        )
+        self.assertEqual(
+            response.json(),
+            {
+                "check_in": self.check_in.isoformat(),
+                "check_out": self.check_out.isoformat(),
+                "nights": 3,
+                "total": "450.00",
+                "average": "150.00",
+            },
+        )
+        bad = self.client.get(
+            reverse("get_quote", args=[self.double.id]),
+            {"check_in": self.check_out, "check_out": self.check_in},
+        )
+        self.assertEqual(bad.status_code, 400)
+
+    def test_search_longer_than_a_year_is_never_priced(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("home"),
+                {
+                    "check_in": self.check_in,
+                    "check_out": self.check_in + timedelta(days=2 * 365),
+                    "adults": 1,
+                },
+                HTTP_HX_REQUEST="true",
+            )
+        self.assertFalse(response.context["form"].is_valid())
+        self.assertFalse([q for q in queries if "bookings_raterule" in q["sql"]])
+
+    def test_stay_without_nights_is_a_form_error(self):
+        with self.assertRaises(ValidationError):
+            quote(self.double, self.check_in, self.check_in)
+
+        admin_user = CustomUser.objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse("admin:bookings_booking_add"),
+            {
+                "room": self.double.pk,
+                "guest": admin_user.pk,
+                "status": "pending",
+                "check_in": self.check_in,
+                "check_out": self.check_in,
+                "num_adults": 1,
+                "num_children": 0,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("check_out", response.context["adminform"].form.errors)
+        self.assertFalse(Booking.objects.exists())
+
+
+class SQLiteProfileTests(TestCase):
+    def test_production_profile_tunes_each_connection(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        profile = settings.SQLITE_PROFILES["production"]
+        wrapper = DatabaseWrapper(
+            {
+                **connection.settings_dict,
+                "NAME": f"{directory}/profile.sqlite3",
+                "OPTIONS": profile,
+            },
+            alias="profile",
+        )
+        self.addCleanup(wrapper.close)
+
+        with wrapper.cursor() as cursor:
+            pragmas = {}
+            for name in ("journal_mode", "synchronous", "busy_timeout"):
+                cursor.execute(f"PRAGMA {name}")
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(
+            pragmas,
+            {
+                "journal_mode": "wal",
+                "synchronous": 1,
+                "busy_timeout": int(profile["timeout"] * 1000),
+            },
+        )
+        self.assertEqual(wrapper.transaction_mode, "IMMEDIATE")
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.room = create_room("101")
+
+    def test_requests_are_recorded_per_url_name(self):
+        for _ in range(2):
+            self.client.get(reverse("get_booked_dates", args=[self.room.id]))
+        self.client.get("/no-such-page/")
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 302)
+
+        staff = CustomUser.objects.create(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        body = self.client.get(reverse("metrics")).content.decode()
+
+        label = 'view="get_booked_dates",method="GET"'
+        self.assertIn(f'hotel_requests_total{{{label},status="200"}} 2', body)
+        self.assertIn(f"hotel_request_duration_seconds_count{{{label}}} 2", body)
+        self.assertIn(f'hotel_request_queries_bucket{{{label},le="5"}} 2', body)
+        self.assertIn(f"hotel_request_queries_sum{{{label}}} 6", body)
+        self.assertIn(
+            'hotel_requests_total{view="<unresolved>",method="GET",status="404"} 1',
+            body,
+        )
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir)
+        create_room("101")
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_query_logged_with_origin_and_plan(self):
+        template = Template("{% for room in rooms %}{{ room.room_number }}{% endfor %}")
+        with self.assertLogs("bookings.slow_queries") as logs:
+            template.render(Context({"rooms": Room.objects.filter(floor=1)}))
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertIn('"bookings_room"', entry["sql"])
+        self.assertEqual(entry["params"], [1])
+        self.assertEqual(entry["template"], "<unknown source>:1")
+        self.assertTrue(entry["code"].startswith("bookings/tests.py:"))
+        self.assertIn("bookings_room", entry["plan"])
+
+    def test_admin_page_ranks_statements_by_total_time(self):
+        log = f"{self.log_dir}/slow.log"
+        lines = [
+            {"sql": "SELECT a", "ms": 30, "view": "home", "params": [1]},
+            {"sql": "SELECT b", "ms": 50, "view": "room_detail", "params": [2]},
+            {"sql": "SELECT a", "ms": 40, "view": "home", "params": [3]},
+        ]
+        with open(log, "w") as file:
+            file.writelines(json.dumps(line) + "\n" for line in lines)
+        with open(f"{log}.1", "w") as file:
+            file.write("not json\n")
+
+        with override_settings(SLOW_QUERY_LOG=log, SLOW_QUERY_MS=25):
+            offenders = top_offenders()
+            self.client.force_login(
+                CustomUser.objects.create(
+                    username="admin", is_staff=True, is_superuser=True
+                )
+            )
+            response = self.client.get(reverse("admin_slow_queries"))
+
+        self.assertEqual(
+            [(o["sql"], o["count"], o["total_ms"]) for o in offenders],
+            [("SELECT a", 2, 70), ("SELECT b", 1, 50)],
+        )
+        self.assertEqual(offenders[0]["slowest"]["params"], [3])
+        self.assertContains(response, "70 ms in 2 runs")
+
+        # Behind the admin login, for superusers only
+        self.client.logout()
+        url = reverse("admin_slow_queries")
+        self.assertRedirects(
+            self.client.get(url), f"{reverse('admin:login')}?next={url}"
+        )
+        self.client.force_login(
+            CustomUser.objects.create(username="staff", is_staff=True)
+        )
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class BulkAvailabilityTests(TestCase):
+    def test_one_query_answers_every_room_and_range(self):
+        guest = CustomUser.objects.create(username="guest")
+        rooms = [create_room(str(number)) for number in (101, 102, 103)]
+        start = timezone.localdate() + timedelta(days=10)
+        booking = Booking.objects.create(
+            room=rooms[0],
+            guest=guest,
+            check_in=start,
+            check_out=start + timedelta(days=2),
+            num_adults=1,
+        )
+        Booking.objects.create(
+            room=rooms[1],
+            guest=guest,
+            check_in=start + timedelta(days=3),
+            check_out=start + timedelta(days=5),
+            num_adults=1,
+        )
+        ranges = [
+            (start - timedelta(days=2), start - timedelta(days=1)),
+            (start - timedelta(days=1), start),
+            (start + timedelta(days=2), start + timedelta(days=3)),
+            (start + timedelta(days=6), start + timedelta(days=8)),
+        ]
+
+        with self.assertNumQueries(1):
+            availability = Room.availability([room.pk for room in rooms], ranges)
+
+        self.assertEqual(
+            [list(availability[room.pk].values()) for room in rooms],
+            [
+                [True, False, False, True],
+                [True, True, False, True],
+                [True, True, True, True],
+            ],
+        )
+        for room in rooms:
+            for check_in, check_out in ranges:
+                self.assertEqual(
+                    room.is_available(check_in, check_out),
+                    availability[room.pk][check_in, check_out],
+                )
+        self.assertTrue(rooms[0].is_available(*ranges[1], exclude_booking=booking))
+
+
+@override_settings(COMPRESS_ENABLED=False, COMPRESS_PRECOMPILERS=())
+class FlexibleSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.check_in = timezone.localdate() + timedelta(days=20)
+        self.free = create_room("101")
+        self.busy = create_room("102")
+        # Holds check_in + 1 .. check_in + 3, check-out day included
+        Booking.objects.create(
+            room=self.busy,
+            guest=CustomUser.objects.create(username="guest"),
+            check_in=self.check_in + timedelta(days=1),
+            check_out=self.check_in + timedelta(days=3),
+            num_adults=1,
+        )
+
+    def test_sweep_finds_every_open_check_in_in_two_queries(self):
+        first = self.check_in - timedelta(days=3)
+        last = self.check_in + timedelta(days=3)
+        with self.assertNumQueries(2):
+            open_check_ins = Room.objects.open_check_ins(first, last, 2)
+
+        days = [first + timedelta(days=i) for i in range(7)]
+        self.assertEqual(open_check_ins[self.free.pk], days)
+        # A 2-night stay also holds its check-out day
+        self.assertEqual(
+            open_check_ins[self.busy.pk],
+            [day for day in days if day < self.check_in - timedelta(days=1)]
+            + [day for day in days if day > self.check_in + timedelta(days=3)],
+        )
+
+    def test_home_lists_open_dates_with_prices(self):
+        response = self.client.get(
+            reverse("home"),
+            {
+                "check_in": self.check_in,
+                "check_out": self.check_in + timedelta(days=2),
+                "adults": 1,
+                "flexibility": "1",
+            },
+            HTTP_HX_REQUEST="true",
+        )
+        stays = {room.pk: room.open_stays for room, _ in response.context["room_cards"]}
+        self.assertEqual(len(stays[self.free.pk]), 3)
+        # No 2-night stay within a day of the booking fits the busy room
+        self.assertNotIn(self.busy.pk, stays)
+        self.assertEqual(stays[self.free.pk][0][2], Decimal("200.00"))
+
+    def test_window_in_the_past_finds_no_rooms(self):
+        today = timezone.localdate()
+        Booking.objects.create(
+            room=self.free,
+            guest=CustomUser.objects.get(username="guest"),
+            check_in=today - timedelta(days=9),
+            check_out=today + timedelta(days=1),
+            num_adults=1,
+        )
+        response = self.client.get(
+            reverse("home"),
+            {
+                "check_in": today - timedelta(days=10),
+                "check_out": today - timedelta(days=9),
+                "adults": 1,
+                "flexibility": "1",
+            },
+            HTTP_HX_REQUEST="true",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["room_cards"], [])
+
+
+class SyntheticDataBenchmarkTests(TestCase):
+    def test_generated_history_never_overlaps(self):
+        written = generate(rooms=8, guests=20, years=1, batch_size=50)
+
+        self.assertEqual(
+            set(Room.objects.values_list("room_type", flat=True)),
+            {room_type for room_type, _ in Room.ROOM_TYPES},
+        )
+        self.assertEqual(Booking.objects.count(), written["bookings"])
+        self.assertEqual(RoomNight.objects.count(), written["room_nights"])
+        self.assertFalse(Booking.objects.filter(total_price__lte=0).exists())
+        self.assertFalse(
+            Booking.objects.filter(booking_date__gt=timezone.now()).exists()
+        )
+        for room in Room.objects.all():
+            stays = list(room.bookings.order_by("check_in"))
+            self.assertGreater(len(stays), 30)
+            for before, after in zip(stays, stays[1:]):
+                self.assertGreater(after.check_in, before.check_out)
+
+    def test_run_and_compare_against_a_baseline(self):
+        generate(rooms=1, guests=1, bookings=5)
+        room = Room.objects.get()
+        result = run_scenario(
+            Scenario("booked_dates", reverse("get_booked_dates", args=[room.id])),
+            iterations=3,
+            warmup=1,
+        )
+
+        self.assertEqual(result["queries"], 3)
+        self.assertEqual(compare({"booked_dates": result}, {}, 0.25), [])
+        baseline = {"booked_dates": {**result, "queries": 2, "p50_ms": 0.001}}
+        self.assertEqual(len(compare({"booked_dates": result}, baseline, 0.25)), 2)
+
+
+class DailyStatsTests(TestCase):
+    def setUp(self):
+        self.room = create_room(price_per_night=100)
+        self.guest = CustomUser.objects.create(username="guest")
+        self.check_in = timezone.localdate() + timedelta(days=3)
+
+    def book(self, **kwargs):
+        kwargs.setdefault("check_out", self.check_in + timedelta(days=2))
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(
+                room=self.room,
+                guest=self.guest,
+                check_in=self.check_in,
+                num_adults=1,
+                **kwargs,
+            )
+
+    def stats(self):
+        return list(
+            DailyStats.objects.order_by("date").values_list(
+                "date", "rooms_sold", "room_revenue", "nights_booked"
+            )
+        )
+
+    def test_booking_changes_update_their_dates(self):
+        booking = self.book()
+        today = timezone.localdate()
+        expected = [
+            (today, 0, 0, 2),
+            (self.check_in, 1, 100, 0),
+            (self.check_in + timedelta(days=1), 1, 100, 0),
+        ]
+        self.assertEqual(self.stats(), expected)
+
+        rebuild_daily_stats()
+        self.assertEqual(self.stats(), expected)
+
+        booking.status = "cancelled"
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(self.stats(), [])
+
+    def test_stay_without_nights_sells_no_room(self):
+        self.book(check_out=self.check_in, total_price=Decimal("100.00"))
+        rebuild_daily_stats()
+        self.assertEqual(self.stats(), [])
+
+    def test_dashboard_reads_only_daily_stats(self):
+        self.book()
+        admin_user = CustomUser.objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin_user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:index"))
+
+        self.assertContains(response, "RevPAR")
+        self.assertEqual(response.context["stats_kpis"]["pickup"], 2)
+        self.assertFalse([q["sql"] for q in queries if "bookings_booking" in q["sql"]])
+
+    def test_dashboard_ignores_impossible_start_dates(self):
+        admin_user = CustomUser.objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin_user)
+
+        for start in ("2024-02-30", "9999-12-31"):
+            response = self.client.get(reverse("admin:index"), {"from": start})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["stats_start"], timezone.localdate())
+
+
+class AdminChangelistQueryTests(TestCase):
+    def setUp(self):
+        self.admin_user = CustomUser.objects.create_superuser(
+            "admin", "admin@example.com", "pw"
+        )
+        self.client.force_login(self.admin_user)
+        self.check_in = timezone.now().date()
+
+    def add_rows(self, count):
+        for _ in range(count):
+            room = create_room(number=f"{Room.objects.count() + 1}")
+            GalleryImage.objects.create(
+                room=room, image=f"gallery/{room.room_number}.jpg", is_primary=True
+            )
+            Booking.objects.create(
+                room=room,
+                guest=CustomUser.objects.create(
+                    username=f"guest{CustomUser.objects.count()}"
+                ),
+                check_in=self.check_in,
+                check_out=self.check_in + timedelta(days=1),
+                num_adults=1,
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for model in ("booking", "room", "galleryimage"):
+            with self.subTest(model=model):
+                url = reverse(f"admin:bookings_{model}_changelist")
+                self.add_rows(2)
+                small = self.count_queries(url)
+                self.add_rows(5)
+                self.assertEqual(self.count_queries(url), small)
+
+
+class BookingAutocompleteTests(TestCase):
+    def setUp(self):
+        admin_user = CustomUser.objects.create_superuser(
+            "admin", "admin@example.com", "pw"
+        )
+        self.client.force_login(admin_user)
+        CustomUser.objects.create(username="Alice", email="alice@example.com")
+        CustomUser.objects.create(username="bob", email="ALIAS@example.com")
+        CustomUser.objects.create(username="carol", email="carol@example.com")
+
+    def autocomplete(self, field_name, term):
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "term": term,
+                "app_label": "bookings",
+                "model_name": "booking",
+                "field_name": field_name,
+            },
+        )
+        return [result["text"] for result in response.json()["results"]]
+
+    def test_guest_search_matches_username_or_email_prefix(self):
+        self.assertEqual(
+            self.autocomplete("guest", "ali"), ["Alice (Customer)", "bob (Customer)"]
+        )
+
+    def test_room_search_matches_room_number_prefix(self):
+        create_room(number="204")
+        create_room(number="310")
+        self.assertEqual(self.autocomplete("room", "2"), ["204 - Room 204"])
+
+    def test_change_form_does_not_list_every_guest(self):
+        response = self.client.get(reverse("admin:bookings_booking_add"))
+        self.assertNotContains(response, "carol")
+
+
+class ExplainQueriesTests(TestCase):
+    def test_each_lookup_uses_its_index(self):
+        room = create_room()
+        Booking.objects.create(
+            room=room,
+            guest=CustomUser.objects.create(username="guest"),
+            check_in=timezone.now().date(),
+            check_out=timezone.now().date() + timedelta(days=2),
+            num_adults=1,
+        )
+        out = io.StringIO()
+        call_command("explain_queries", stdout=out, no_color=True)
+        # Each block is the label, the SQL, then the plan rows.
+        plans = {
+            label: plan
+            for label, _, plan in (
+                block.split("\n", 2) for block in out.getvalue().split("\n\n") if block
+            )
+        }
+
+        expected = {
+            "home: available rooms": ["room_night_date_room_idx"],
+            "Room.availability": ["booking_room_status_out_idx"],
+            "get_booked_dates: booked ranges": ["booking_room_status_out_idx"],
+            "get_booked_dates: ETag": ["booking_room_updated_idx"],
+            "BookingAdmin: all reservations": ["booking_date_idx"],
+            "BookingAdmin: team reservations": ["booking_status_date_idx"],
+            "BookingAdmin: guest reservations": ["booking_guest_date_idx"],
+            "BookingAdmin: guest autocomplete": [
+                "user_username_lower_idx",
+                "user_email_lower_idx",
+            ],
+            "BookingAdmin: room autocomplete": ["room_number_lower_idx"],
+        }
+        self.assertEqual(plans.keys(), expected.keys())
+        for label, indexes in expected.items():
+            for index in indexes:
+                with self.subTest(lookup=label, index=index):
+                    self.assertIn(index, plans[label])
@@ -1,7 +1,6 @@
 from django.urls import path
 from . import views
 
-
 urlpatterns = [
     path("", views.home, name="home"),
     path("room/<int:room_id>/", views.room_detail, name="room_detail"),
@@ -11,4 +10,6 @@ urlpatterns = [
         views.get_booked_dates,
         name="get_booked_dates",
     ),
+    path("room/<int:room_id>/quote/", views.get_quote, name="get_quote"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
@@ -1,84 +1,281 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib import messages
+from django.contrib.messages import get_messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from .models import Room
-from .forms import RoomFilterForm, BookingForm
+from django.db.models import Count, Max
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.vary import vary_on_headers
+from .caching import (
+    aflexible_search_key,
+    aget_room_search,
+    aroom_search_key,
+    aset_room_search,
+    get_room_cards,
+    room_card_key,
+    set_room_cards,
+)
+from .decorators import async_etag
+from .models import (
+    Booking,
+    GalleryImage,
+    RateRule,
+    Room,
+    RoomNight,
+    RoomNotAvailable,
+)
+from .forms import MAX_STAY_NIGHTS, RoomFilterForm, BookingForm
+from .metrics import registry
+from .pricing import CENT, RateCalendar
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+import hashlib
 import json
 from datetime import timedelta
 
 
-def home(request):
+def render_room_cards(rooms):
+    """Pair each room with its rendered card, rendering only cache misses"""
+    keys = {room.pk: room_card_key(room) for room in rooms}
+    cards = get_room_cards(keys.values())
+    missing = {}
+    for room in rooms:
+        if keys[room.pk] not in cards:
+            missing[keys[room.pk]] = render_to_string(
+                "bookings/partials/room_card.html", {"room": room}
+            )
+    if missing:
+        set_room_cards(missing)
+        cards.update(missing)
+    return [(room, mark_safe(cards[keys[room.pk]])) for room in rooms]
+
+
+async def page_etag(request, *parts):
+    """ETag for a rendered page, or None when it has to be rendered anyway"""
+    # Flash messages are shown once, so a page carrying them is never reused
+    if await sync_to_async(lambda: len(get_messages(request)))():
+        return None
+    # The navbar, CSRF token and HTMX partial vary per request, not per URL
+    user = await request.auser()
+    parts += (
+        user.pk,
+        user.is_staff,
+        request.META.get("CSRF_COOKIE"),
+        bool(request.htmx),
+    )
+    return hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+
+
+async def home_etag(request):
+    rooms = await Room.objects.filter(is_active=True).aaggregate(
+        last_change=Max("updated_at"), count=Count("id")
+    )
+    images = await GalleryImage.objects.aaggregate(
+        last_upload=Max("upload_date"),
+        last_processed=Max("processed_at"),
+        count=Count("id"),
+    )
+    parts = [*rooms.values(), *images.values()]
+
+    form = RoomFilterForm(request.GET or None)
+    if form.is_valid():
+        # Held nights come from the database, not a cached version token: each
+        # worker process has its own cache and misses the others' bookings.
+        # Ids only grow, so nights freed and held again still change the tag.
+        first, last = form.get_search_window()
+        nights = await RoomNight.objects.filter(date__range=(first, last)).aaggregate(
+            last_id=Max("id"), count=Count("id")
+        )
+        parts.extend(nights.values())
+        # Searches show stay totals, which follow the rate calendar
+        rates = await RateRule.objects.aaggregate(
+            last_change=Max("updated_at"), count=Count("id")
+        )
+        parts.extend(rates.values())
+    return await page_etag(request, *parts)
+
+
+@vary_on_headers("HX-Request")
+@async_etag(home_etag)
+async def home(request):
     form = RoomFilterForm(request.GET or None)
-    rooms = Room.objects.filter(is_active=True)
+    rooms = Room.objects.filter(is_active=True).prefetch_related("images")
 
     if form.is_valid():
         check_in = form.cleaned_data["check_in"]
         check_out = form.cleaned_data["check_out"]
         adults = form.cleaned_data["adults"]
-        children = form.cleaned_data.get("children", 0)
-
+        children = form.cleaned_data.get("children") or 0
         # Filter by capacity
-        rooms = rooms.filter(
+        candidates = rooms.filter(
             capacity_adults__gte=adults, capacity_children__gte=children
         )
 
-        # Filter out booked rooms
-        unavailable_rooms = Room.objects.filter(
-            bookings__check_in__lte=check_out,
-            bookings__check_out__gte=check_in,
-            bookings__status__in=["pending", "confirmed"],
-        )
-        rooms = rooms.exclude(id__in=unavailable_rooms.values_list("id", flat=True))
+        if form.is_flexible:
+            # Every room and check-in date in the window, from one sweep
+            first, last = form.get_check_in_range()
+            nights = form.nights
+            cache_key = await aflexible_search_key(
+                first, last, nights, adults, children
+            )
+            open_check_ins = await aget_room_search(cache_key)
+            if open_check_ins is None:
+                open_check_ins = await candidates.aopen_check_ins(first, last, nights)
+                await aset_room_search(cache_key, open_check_ins)
+            room_ids = list(open_check_ins)
+        else:
+            cache_key = await aroom_search_key(check_in, check_out, adults, children)
+            room_ids = await aget_room_search(cache_key)
+            if room_ids is None:
+                # Drop booked rooms
+                room_ids = [
+                    room_id
+                    async for room_id in candidates.available_between(
+                        check_in, check_out
+                    ).values_list("id", flat=True)
+                ]
+                await aset_room_search(cache_key, room_ids)
+        rooms = rooms.filter(id__in=room_ids)
 
-    context = {"form": form, "rooms": rooms, "is_filtered": form.is_valid()}
+    rooms = [room async for room in rooms]
+    # The form caps the window at MAX_STAY_NIGHTS, which bounds the calendars
+    if form.is_valid() and form.is_flexible:
+        # Every room and date pair is priced from one calendar load
+        calendar = await RateCalendar.aload(first, last + timedelta(days=nights))
+        stay = timedelta(days=nights)
+        for room in rooms:
+            room.open_stays = [
+                (day, day + stay, calendar.price(room, day, day + stay))
+                for day in open_check_ins[room.pk]
+            ]
+    elif form.is_valid():
+        # Every candidate room is priced from one calendar load
+        calendar = await RateCalendar.aload(check_in, check_out)
+        totals = calendar.price_rooms(rooms, check_in, check_out)
+        for room in rooms:
+            room.stay_total = totals[room.pk]
+    context = {
+        "form": form,
+        "room_cards": await sync_to_async(render_room_cards)(rooms),
+        "is_filtered": form.is_valid(),
+    }
 
+    # Templates read the session and user lazily, so render off the event loop
     if request.htmx:
-        return render(request, "bookings/partials/room_list.html", context)
-    return render(request, "bookings/home.html", context)
+        template_name = "bookings/partials/room_list.html"
+    else:
+        template_name = "bookings/home.html"
+    return await sync_to_async(render)(request, template_name, context)
 
 
-def get_booked_dates(request, room_id):
-    room = get_object_or_404(Room, id=room_id)
-    # Get all confirmed and pending bookings
-    bookings = room.bookings.filter(
-        status__in=["pending", "confirmed"],
-        check_out__gte=timezone.now().date(),  # Only get current and future bookings
+async def booked_dates_etag(request, room_id):
+    # Any booking change for the room bumps updated_at or the row count, and
+    # the date rolls the window of current and future bookings forward. A
+    # missing room gets no ETag, so its 404 can never be revalidated to a 304.
+    stats = await Room.objects.filter(id=room_id).aaggregate(
+        found=Count("id"),
+        last_change=Max("bookings__updated_at"),
+        count=Count("bookings"),
     )
+    if not stats["found"]:
+        return None
+    key = f"{room_id}:{stats['last_change']}:{stats['count']}:{timezone.now().date()}"
+    return hashlib.md5(key.encode()).hexdigest()
 
-    booked_dates = []
-    for booking in bookings:
-        current_date = booking.check_in
-        while current_date <= booking.check_out:
-            booked_dates.append(current_date.strftime("%Y-%m-%d"))
-            current_date += timedelta(days=1)
 
-    return JsonResponse({"booked_dates": booked_dates})
+def expand_ranges(ranges):
+    return [
+        (start + timedelta(days=i)).strftime("%Y-%m-%d")
+        for start, end in ranges
+        for i in range((end - start).days + 1)
+    ]
 
 
-def room_detail(request, room_id):
-    room = get_object_or_404(Room, id=room_id)
-    form = BookingForm(request.GET or None)
+@cache_control(no_cache=True)
+@async_etag(booked_dates_etag)
+async def get_booked_dates(request, room_id):
+    room = await aget_object_or_404(Room, id=room_id)
+    # Current and future pending/confirmed bookings, merged into ranges
+    ranges = await room.aget_booked_ranges()
+
+    # ?flat=1 keeps the old one-string-per-date format for existing clients
+    if request.GET.get("flat"):
+        return JsonResponse({"booked_dates": expand_ranges(ranges)})
+
+    return JsonResponse(
+        {
+            "booked_ranges": [
+                [start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")]
+                for start, end in ranges
+            ]
+        }
+    )
+
 
-    # Get booked dates for initial load
-    bookings = room.bookings.filter(
-        status__in=["pending", "confirmed"], check_out__gte=timezone.now().date()
+async def room_detail_etag(request, room_id):
+    room = await Room.objects.filter(id=room_id).values_list("updated_at").afirst()
+    if room is None:
+        return None
+    images = await GalleryImage.objects.filter(room_id=room_id).aaggregate(
+        last_upload=Max("upload_date"),
+        last_processed=Max("processed_at"),
+        count=Count("id"),
+    )
+    return await page_etag(
+        request,
+        room,
+        *images.values(),
+        await booked_dates_etag(request, room_id),
     )
 
-    booked_dates = []
-    for booking in bookings:
-        current_date = booking.check_in
-        while current_date <= booking.check_out:
-            booked_dates.append(current_date.strftime("%Y-%m-%d"))
-            current_date += timedelta(days=1)
+
+@async_etag(room_detail_etag)
+async def room_detail(request, room_id):
+    room = await aget_object_or_404(Room.objects.prefetch_related("images"), id=room_id)
+    form = BookingForm(request.GET or None)
+
+    # Get booked date ranges for initial load
+    booked_ranges = [
+        {"from": start.strftime("%Y-%m-%d"), "to": end.strftime("%Y-%m-%d")}
+        for start, end in await room.aget_booked_ranges()
+    ]
 
     context = {
         "room": room,
         "form": form,
-        "booked_dates_json": json.dumps(booked_dates),
+        "booked_ranges_json": json.dumps(booked_ranges),
     }
-    return render(request, "bookings/room_detail.html", context)
+    return await sync_to_async(render)(request, "bookings/room_detail.html", context)
+
+
+async def get_quote(request, room_id):
+    """Total price of a stay in a room, for the booking form's preview"""
+    room = await aget_object_or_404(Room, id=room_id)
+    check_in = parse_date(request.GET.get("check_in", ""))
+    check_out = parse_date(request.GET.get("check_out", ""))
+    if not (check_in and check_out and check_in < check_out):
+        return JsonResponse(
+            {"error": "check_in and check_out must be dates, in order"}, status=400
+        )
+    if (check_out - check_in).days > MAX_STAY_NIGHTS:
+        return JsonResponse({"error": "Stays are limited to a year"}, status=400)
+
+    calendar = await RateCalendar.aload(check_in, check_out)
+    total = calendar.price(room, check_in, check_out)
+    nights = (check_out - check_in).days
+    return JsonResponse(
+        {
+            "check_in": check_in.isoformat(),
+            "check_out": check_out.isoformat(),
+            "nights": nights,
+            "total": str(total),
+            "average": str((total / nights).quantize(CENT)),
+        }
+    )
 
 
 @login_required
@@ -88,20 +285,17 @@ def book_room(request, room_id):
     if request.method == "POST":
         form = BookingForm(request.POST)
         if form.is_valid():
-            # Check if room is available for these dates
-            check_in = form.cleaned_data["check_in"]
-            check_out = form.cleaned_data["check_out"]
-
-            if room.is_available(check_in, check_out):
-                booking = form.save(commit=False)
-                booking.room = room
-                booking.guest = request.user
-                booking.save()
-
+            booking = form.save(commit=False)
+            booking.guest = request.user
+            try:
+                room.reserve(booking)
+            except RoomNotAvailable:
+                messages.error(
+                    request, "Room is no longer available for selected dates."
+                )
+            else:
                 messages.success(request, "Room booked successfully!")
                 return redirect("room_detail", room_id=room.id)
-            else:
-                messages.error(request, "Room is not available for selected dates.")
     else:
         form = BookingForm()
 
@@ -110,3 +304,11 @@ def book_room(request, room_id):
         "form": form,
     }
     return render(request, "bookings/book_room.html", context)
+
+
+@staff_member_required
+def metrics(request):
+    """Request metrics of this worker process, for Prometheus to scrape"""
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -31,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole stack
+    "bookings.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -61,10 +63,42 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "hotel_management.wsgi.application"
 
+# SQLite connection profiles, picked with SQLITE_PROFILE. "production"
+# lets readers run while book_room writes (WAL), makes a blocked writer
+# wait up to the busy timeout instead of failing with "database is
+# locked", and starts transactions with BEGIN IMMEDIATE so one never fails
+# halfway when upgrading its read lock. synchronous=NORMAL is durable
+# under WAL except for the last commits on power loss. "default" is
+# SQLite's stock behaviour, used unless a deployment opts in with
+# SQLITE_PROFILE=production.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 2**20)),
+    # Negative values are KiB rather than pages
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", 64 * 1024)),
+    "temp_store": "MEMORY",
+}
+SQLITE_PROFILES = {
+    # journal_mode=WAL persists in the file, so a database once opened with
+    # "production" stays in WAL here too; see the README to switch it back
+    "default": {},
+    "production": {
+        "init_command": "; ".join(
+            f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+        ),
+        "transaction_mode": "IMMEDIATE",
+        # Busy timeout, in seconds
+        "timeout": float(os.getenv("SQLITE_BUSY_TIMEOUT", 20)),
+    },
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": SQLITE_PROFILES[SQLITE_PROFILE],
     }
 }
 
@@ -96,7 +130,7 @@ UNFOLD = {
     "SITE_HEADER": "Hotel Management System",
     "SITE_URL": "/",
     "SITE_ICON": None,
-    "DASHBOARD_CALLBACK": None,
+    "DASHBOARD_CALLBACK": "bookings.stats.dashboard_callback",
     "MENU": {
         "toolbar": [
             {
@@ -164,6 +198,71 @@ ADMIN_SITE_HEADER = "Hotel Management Administration"
 ADMIN_INDEX_TITLE = "Dashboard"
 
 
+# Holds room cards, search results with their per-date version keys, and
+# imagekit's file states. Without REDIS_URL each process keeps its own
+# LocMem cache. It is sized well past Django's default of 300 entries, at
+# which cards and version keys evict each other with a few hundred rooms.
+# A booking in one process then expires searches only in that one. With
+# more than one worker process, set REDIS_URL (and pip install redis) so
+# they all share a single cache.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 50_000))},
+        }
+    }
+
+# Seconds a home page search result (matching room ids) stays cached.
+# Booking and Room changes expire affected entries sooner, in every
+# process only with a shared cache (see CACHES).
+ROOM_SEARCH_CACHE_TIMEOUT = 300
+
+# Seconds a rendered room card stays cached. The key changes with
+# Room.updated_at and the primary image, so this only bounds memory use;
+# every active room needs an entry, so keep CACHE_MAX_ENTRIES above the
+# room count plus a year of search version keys.
+ROOM_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Log queries slower than this many milliseconds, with their query plan,
+# to SLOW_QUERY_LOG (rotated) and the admin's "Slow queries" page.
+# Off unless set, e.g. SLOW_QUERY_MS=50.
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+SLOW_QUERY_MS = float(SLOW_QUERY_MS) if SLOW_QUERY_MS else None
+SLOW_QUERY_LOG = BASE_DIR / "slow_queries.log"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"message": {"format": "%(message)s"}},
+    "handlers": {
+        "slow_queries": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "maxBytes": 10 * 2**20,
+            "backupCount": 5,
+            # Only create the file once a slow query is logged
+            "delay": True,
+            "formatter": "message",
+        },
+    },
+    "loggers": {
+        "bookings.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+
 # Image optimization settings
 IMAGEKIT_DEFAULT_CACHEFILE_STRATEGY = "imagekit.cachefiles.strategies.Optimistic"
 IMAGEKIT_CACHE_BACKEND = "default"
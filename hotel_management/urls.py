@@ -3,7 +3,15 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from bookings.admin import slow_queries
+
 urlpatterns = [
+    # Ahead of admin.site.urls, whose catch-all would swallow it
+    path(
+        "admin/slow-queries/",
+        admin.site.admin_view(slow_queries),
+        name="admin_slow_queries",
+    ),
     path("admin/", admin.site.urls),
     path("", include("bookings.urls")),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)